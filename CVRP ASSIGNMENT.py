@@ -1,241 +1,114 @@
-import json
-from ortools.constraint_solver import routing_enums_pb2
-from ortools.constraint_solver import pywrapcp
-import math
-from collections import defaultdict
+from datetime import datetime
+from cvrp_model import build_routing_model, default_search_parameters, search_stats, solve_anytime
+from cvrp_decompose import solve_decomposed
+from cvrp_instance import load_instance
+from cvrp_routes import extract_routes, read_routes_json, route_summary, routes_to_dict, write_routes_json
+from cvrp_warm_start import initial_assignment, plan_changes, warm_start_routes
+from telemetry import new_run, ortools_trajectory, phase, write_run
 
 
 def transform_json_to_dict(file_path):
-    with open(file_path, 'r') as file:
-        json_data = json.load(file)
-    
-    # Create a mapping from loc_ids like "loc0" to indices 0, 1, 2, ...
-    loc_id_to_index = {loc_id: index for index, loc_id in enumerate(json_data["loc_ids"])}
-    
-    # Set the depot as index 0 (assuming "loc0" is the depot)
-    depot = loc_id_to_index.get("loc0", 0)  # Default to 0 if "loc0" isn't found
-    
-    # Aggregate the orders for each location
-    aggregated_weight = defaultdict(int)
-    aggregated_volume = defaultdict(int)
-    
-    for loc, weight, volume in zip(json_data["location_matrix"], json_data["weight_matrix"], json_data["volume_matrix"]):
-        index = loc_id_to_index[loc]
-        aggregated_weight[index] += weight*1000  # Convert weight to integer
-        aggregated_volume[index] += int(volume)  # Convert volume to integer
-    
-    # Update the weight_matrix and volume_matrix with aggregated integer values
-    json_data["weight_matrix"] = [int(aggregated_weight[index]) for index in range(len(loc_id_to_index))]
-    json_data["volume_matrix"] = [int(aggregated_volume[index]) for index in range(len(loc_id_to_index))]
-
-    # Replace "location_matrix" values (e.g., "loc1", "loc2") with their corresponding indices
-    json_data["location_matrix"] = list(range(len(loc_id_to_index)))
-
-    # Add depot index to the dictionary
-    json_data["depot"] = int(depot)  # Convert depot index to integer
-    
-    # Convert other numeric values in the dictionary to integers
-    if "distance" in json_data:
-        json_data["distance"] = [[int(value) for value in row] for row in json_data["distance"]]
-    
-    if "perKmCostPerVehicle" in json_data:
-        json_data["perKmCostPerVehicle"] = [int(value) for value in json_data["perKmCostPerVehicle"]]
-
-
-    return json_data
-
-
-file_path = 'C:/Users/Acer/Downloads/assignment_cvrp.json'
-data = transform_json_to_dict(file_path)
-def print_solution(data, manager, routing, solution):
-    """Prints solution on console."""
-    print(f"Objective: {solution.ObjectiveValue()}")
-    total_distance = 0
-    total_volume = 0
-    total_weight = 0
-
-
-    for vehicle_id in range(data["num_vehicles"]):
-        index = routing.Start(vehicle_id)
-        plan_output = f"Route for vehicle {vehicle_id}:\n"
-        route_distance = 0
-        route_volume = 0
-        route_weight = 0
-        while not routing.IsEnd(index):
-            node_index = manager.IndexToNode(index)
-            route_volume += data["volume_matrix"][node_index]
-            route_weight += data["weight_matrix"][node_index]
-            plan_output += (
-                f" {node_index} "
-                f"Volume({route_volume}) "
-                f"Weight({route_weight}) -> "
+    # Today's JSON or the binary format of cvrp_instance.py (JSON header + memory-mapped distance .npy,
+    # see convert_instance). Orders are aggregated per location with np.bincount, weights in
+    # grams (kg * 1000) and volumes as int; "distance" is an integer NumPy array, depot is "loc0"
+    return load_instance(file_path)
+
+
+def print_solution(routes):
+    """Prints solution on console (routes from cvrp_routes.extract_routes)."""
+    print(route_summary(routes))
+
+
+if __name__ == '__main__':
+    run = new_run('cvrp')  # Phase timings and the cost of every solution found, see telemetry.py
+    file_path = 'C:/Users/Acer/Downloads/assignment_cvrp.json'  # or a .header.json from cvrp_instance.convert_instance
+    with phase(run, 'read_data'):
+        data = transform_json_to_dict(file_path)
+
+    # 'single': one routing model for all locations. 'decompose': sweep clusters of cluster_size
+    # customers, each with a share of the fleet, solved in parallel processes and merged
+    # (cvrp_decompose.py); for instances with more than a few hundred locations. 'reoptimize':
+    # start the local search from the previous output_file, with vanished locations dropped and
+    # new ones added by cheapest insertion (cvrp_warm_start.py)
+    mode = 'single'
+    cluster_size = 100
+    reoptimize_seconds = 1  # decompose: local search on the merged full solution across cluster edges (0 to skip)
+
+    # Setting search parameters (PATH_CHEAPEST_ARC + simulated annealing)
+    time_budget = 1  # Wall-clock budget of the search in seconds (per cluster in decompose mode)
+    no_improvement_window = None  # e.g. 10: stop once this many seconds pass without a better solution
+    anytime = mode != 'decompose'  # Write every improving solution to output_file while the search runs
+    output_file = 'cvrp_solution.json'
+    json_style = 'indent'  # 'indent' (as before), 'compact' (no whitespace) or 'ndjson' (a summary line, then one route per line)
+    reoptimize_fraction = 0.25  # reoptimize: share of time_budget the search gets when starting from the previous plan
+
+    previous = None
+    if mode == 'reoptimize':
+        # Read before the search overwrites output_file
+        previous = read_routes_json(output_file)
+
+    if mode == 'decompose':
+        with phase(run, 'solve'):
+            manager, routing, solution = solve_decomposed(
+                data, cluster_size=cluster_size, time_limit=time_budget, reoptimize_seconds=reoptimize_seconds
             )
-            previous_index = index
-            index = solution.Value(routing.NextVar(index))
-            route_distance += routing.GetArcCostForVehicle(
-                previous_index, index, vehicle_id
+    else:
+        # Initialize routing manager and model. Arc costs are precomputed integer matrices, one per
+        # group of vehicles with the same perKmCostPerVehicle, and the demands are registered as
+        # vectors, so the search never calls back into Python ('callback' restores the old callbacks)
+        arc_costs = 'matrix'  # 'matrix' or 'callback'
+        with phase(run, 'build_model'):
+            manager, routing = build_routing_model(data, arc_costs=arc_costs)
+        search_parameters = default_search_parameters(time_limit=time_budget)
+
+        initial_solution = None
+        if previous is not None:
+            with phase(run, 'warm_start'):
+                routes, run['warm_start'] = warm_start_routes(previous, data)
+                initial_solution = initial_assignment(routing, manager, routes)
+            print(f"Warm start from {output_file}: {run['warm_start']}, "
+                  f"objective {initial_solution.ObjectiveValue() if initial_solution else 'infeasible, solving from scratch'}")
+            if initial_solution:
+                search_parameters = default_search_parameters(time_limit=time_budget * reoptimize_fraction)
+
+        def write_incumbent(solution, objective, elapsed):
+            # Atomic rename: downstream dispatch can read output_file at any time and always gets a complete plan
+            write_routes_json(
+                extract_routes(data, manager, routing, solution), output_file, style=json_style,
+                timestamp=datetime.now().isoformat(timespec='milliseconds'), elapsed_seconds=round(elapsed, 3),
             )
-        plan_output += (
-            f" {manager.IndexToNode(index)} "
-            f"Volume({route_volume}) "
-            f"Weight({route_weight})\n"
-        )
-        plan_output += f"Cost of the route: {route_distance}\n"
-        plan_output += f"Volume of the route: {route_volume}\n"
-        plan_output += f"Weight of the route: {route_weight}\n"
-        print(plan_output)
-        total_distance += route_distance
-        total_volume += route_volume
-        total_weight += route_weight
-
-        
-    print(f"Total cost of all routes: {total_distance}")
-    print(f"Total volume of all routes: {total_volume}")
-    print(f"Total weight of all routes: {total_weight}")
-
-
-# Initialize routing manager and model
-manager = pywrapcp.RoutingIndexManager(
-    len(data["distance"]), data["num_vehicles"], data["depot"]
-)
-routing = pywrapcp.RoutingModel(manager)
-
-# Vehicle cost callback
-def vehicle_cost_callback(vehicle_id, from_index, to_index):
-    from_node = manager.IndexToNode(from_index)
-    to_node = manager.IndexToNode(to_index)
-    distance = math.ceil(data["distance"][from_node][to_node])
-    hop_cost_val = 0
-    hop_cost = 100  # Fixed hop cost
-
-    if from_node != 0:
-        hop_cost_val += hop_cost
-    
-    return int(data["perKmCostPerVehicle"][vehicle_id] * distance)
-
-# Register the vehicle cost callback and set vehicle costs
-for vehicle_id in range(data["num_vehicles"]):
-    vehicle_cost_callback_index = routing.RegisterTransitCallback(
-        lambda from_index, to_index, vehicle_id=vehicle_id: 
-        vehicle_cost_callback(vehicle_id, from_index, to_index)
-    )
-    routing.SetArcCostEvaluatorOfVehicle(vehicle_cost_callback_index, vehicle_id)
-    vehicle_fixed_cost = math.ceil(data["fixedCostPerVehicle"][vehicle_id])
-    routing.SetFixedCostOfVehicle(vehicle_fixed_cost, vehicle_id)
-
-# Add Weight Capacity constraint.
-def weight_callback(from_index):
-    from_node = manager.IndexToNode(from_index)
-    return data["weight_matrix"][from_node]
-
-weight_callback_index = routing.RegisterUnaryTransitCallback(weight_callback)
-routing.AddDimensionWithVehicleCapacity(
-    weight_callback_index,
-    0,  # null capacity slack
-    data["max_weight"],  # vehicle maximum capacities
-    True,  # start cumul to zero
-    "Weight_Capacity",
-)
-
-# Add Volume Capacity constraint.
-def volume_callback(from_index):
-    from_node = manager.IndexToNode(from_index)
-    return data["volume_matrix"][from_node]
-
-volume_callback_index = routing.RegisterUnaryTransitCallback(volume_callback)
-routing.AddDimensionWithVehicleCapacity(
-    volume_callback_index,
-    0,  # null capacity slack
-    data["max_volume"],  # vehicle maximum capacities
-    True,  # start cumul to zero
-    "Volume_Capacity",
-)
-
-# Setting search parameters
-search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-search_parameters.first_solution_strategy = (
-    routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-)
-search_parameters.local_search_metaheuristic = (
-    routing_enums_pb2.LocalSearchMetaheuristic.SIMULATED_ANNEALING
-)
-search_parameters.time_limit.FromSeconds(1)
-search_parameters.log_search=False
-
-# Solve the problem
-solution = routing.SolveWithParameters(search_parameters)
-                                       
-if solution:
-    print_solution(data, manager, routing, solution)
-
-def solution_to_json(data, manager, routing, solution):
-    """Converts solution to a JSON structure."""
-    solution_dict = {
-        "objective": solution.ObjectiveValue(),
-        "routes": []
-    }
-
-    total_distance = 0
-    total_volume = 0
-    total_weight = 0
-
-    for vehicle_id in range(data["num_vehicles"]):
-        index = routing.Start(vehicle_id)
-        route = {
-            "vehicle_id": vehicle_id,
-            "route": [],
-            "route_cost": 0,
-            "route_volume": 0,
-            "route_weight": 0,
-        }
-        route_distance = 0
-        route_volume = 0
-        route_weight = 0
-
-        while not routing.IsEnd(index):
-            node_index = manager.IndexToNode(index)
-            route_volume += data["volume_matrix"][node_index]
-            route_weight += data["weight_matrix"][node_index]
-            route["route"].append({
-                "location": node_index,
-                "cumulative_volume": route_volume,
-                "cumulative_weight": route_weight
-            })
-            previous_index = index
-            index = solution.Value(routing.NextVar(index))
-            route_distance += routing.GetArcCostForVehicle(previous_index, index, vehicle_id)
-
-      
-        route["route"].append({
-            "location": manager.IndexToNode(index),
-            "cumulative_volume": route_volume,
-            "cumulative_weight": route_weight
-        })
-
-        route["route_cost"] = route_distance
-        route["route_volume"] = route_volume
-        route["route_weight"] = route_weight
-
-        solution_dict["routes"].append(route)
-
-        total_distance += route_distance
-        total_volume += route_volume
-        total_weight += route_weight
-
-    # Add totals to the solution
-    solution_dict["total_cost"] = total_distance
-    solution_dict["total_volume"] = total_volume
-    solution_dict["total_weight"] = total_weight
-
-    return solution_dict
-
-if solution:
-    solution_json = solution_to_json(data, manager, routing, solution)
-
-    # Output solution to a JSON file
-    output_file = 'cvrp_solution.json'
-    with open(output_file, 'w') as json_output:
-        json.dump(solution_json, json_output, indent=4)
-
-    print(f"Solution saved to {output_file}")
 
+        # Solve the problem
+        ortools_trajectory(routing, run['trajectory'], scale=1)
+        with phase(run, 'solve'):
+            if anytime:
+                solution, improvements = solve_anytime(
+                    routing, search_parameters, write_incumbent, no_improvement_seconds=no_improvement_window,
+                    initial_solution=initial_solution,
+                )
+                print(f"{len(improvements)} improving solutions written to {output_file}")
+            elif initial_solution:
+                solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+            else:
+                solution = routing.SolveWithParameters(search_parameters)
+        stats = search_stats(routing)
+        run['search'] = stats
+        print(f"Search ({arc_costs} arc costs): {stats['branches_per_second']:.0f} branches/s, "
+              f"{stats['accepted_neighbors_per_second']:.0f} accepted moves/s")
+
+    if solution:
+        # One pass over the routes; the console report and the JSON file are both built from it
+        routes = extract_routes(data, manager, routing, solution)
+        print_solution(routes)
+
+    if solution and previous is not None:
+        run['plan_changes'] = plan_changes(previous, routes_to_dict(routes), data)
+        print(f"Changes versus the previous plan: {run['plan_changes']}")
+
+    if solution and not anytime:
+        # Output solution to a JSON file, written route by route
+        write_routes_json(routes, output_file, style=json_style)
+
+        print(f"Solution saved to {output_file}")
+
+    print(f'Telemetry saved to {write_run(run)}')
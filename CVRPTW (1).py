@@ -1,130 +1,237 @@
+import numpy as np
 import pandas as pd
 import pulp
 from pulp import GUROBI
+from cvrptw_arcs import allowed_trucks, arc_big_m, feasible_arc_mask, report_arc_reduction
+from cvrptw_data import prepare_cvrptw_data
+from cvrptw_ortools import set_mip_start, solve_cvrptw_routing
+from route_extraction import cvrptw_routes
+from telemetry import new_run, phase, read_solver_log, write_run
+from sparse_milp import (build_cvrptw_milp, build_cvrptw_milp_by_type, cvrptw_routes_from_solution, lp_relaxation_bound,
+                         measure_build, solve_milp_model)
 
-# Load data
-locations_df = pd.read_csv('C:/Users/Acer/Downloads/locations.csv')
-order_list_df = pd.read_excel('C:/Users/Acer/Downloads/order_list_1.xlsx')
-travel_matrix_df = pd.read_csv('C:/Users/Acer/Downloads/travel_matrix.csv')
-trucks_df = pd.read_csv('C:/Users/Acer/Downloads/trucks.csv')
+run = new_run('cvrptw')  # Phase timings and solver progress, written to telemetry_*.json
 
-# Convert loading/unloading windows to minutes with explicit format
-locations_df['start_minutes'] = pd.to_datetime(locations_df['location_loading_unloading_window_start'], format='%H:%M').dt.hour * 60 + pd.to_datetime(locations_df['location_loading_unloading_window_start'], format='%H:%M').dt.minute
-locations_df['end_minutes'] = pd.to_datetime(locations_df['location_loading_unloading_window_end'], format='%H:%M').dt.hour * 60 + pd.to_datetime(locations_df['location_loading_unloading_window_end'], format='%H:%M').dt.minute
+# Load data
+with phase(run, 'read_data'):
+    locations_df = pd.read_csv('C:/Users/Acer/Downloads/locations.csv')
+    order_list_df = pd.read_excel('C:/Users/Acer/Downloads/order_list_1.xlsx')
+    travel_matrix_df = pd.read_csv('C:/Users/Acer/Downloads/travel_matrix.csv')
+    trucks_df = pd.read_csv('C:/Users/Acer/Downloads/trucks.csv')
 
-# Extract relevant data
-locations = locations_df['location_code'].tolist()
-orders = order_list_df.to_dict(orient='records')
-travel_matrix = travel_matrix_df.set_index(['source_location_code', 'destination_location_code']).to_dict(orient='index')
-trucks = trucks_df.to_dict(orient='records')
+# Parse the inputs once into arrays over location / truck indices (windows in minutes, allowed truck bitmasks, travel matrices)
+depot1 = "A123"
+with phase(run, 'prepare_data'):
+    data = prepare_cvrptw_data(locations_df, order_list_df, travel_matrix_df, trucks_df, depot1)
+locations = data.locations
 
 # Constants
-service_time_customer = 20  
-service_time_depot = 60  
-
-depot1 = "A123"
-customers_int=order_list_df["Destination Code"].tolist()
-invoice = order_list_df["Invoice No."].tolist()
-customers_1 = [str(i) for i in customers_int]
-customers=zip(invoice,customers_1)
-# customers = locations[:len(locations)-1]
-loc_without_depot = locations[: len(locations)-1]
-# Initialize the problem
-prob = pulp.LpProblem("CVRPTW", pulp.LpMinimize)
-
-# Create decision variables
-x = {}
-t = {}
-I = {}
-
-for k in range(len(trucks)):
-    I[k] = pulp.LpVariable(f'I_{k}', cat='Binary')
-    for i in locations:
-        for j in locations:
-            x[(i, j, k)] = pulp.LpVariable(f'x_{i}_{j}_{k}',cat='Binary')
-        t[(i, k)] = pulp.LpVariable(f't_{i}_{k}', lowBound=0, cat='Continuous')
-
-# Objective function: Minimize total distance and fixed costs
-prob += pulp.lpSum(
-    travel_matrix.get((i, j), {}).get('travel_distance_in_km', 0) * x[(i, j, k)] * (20000 - int(truck['truck_max_weight']) / 1000)
-    for k, truck in enumerate(trucks)
-    for i in locations
-    for j in locations
-)+pulp.lpSum(
-    int(truck['truck_max_weight']) * 2 * I[k]
-    for k, truck in enumerate(trucks)
-), "Minimize_Total_Cost"
-
-# Flow balancing constraint
-for u,i in customers:
-    if i!=j:
-        prob += pulp.lpSum(x[(i, j, k)] for j in locations for k in range(len(trucks)))==pulp.lpSum(x[(j, i, k)] for j in locations for k in range(len(trucks)))==1, f"Flow_Balancing_{u}"
-
-# demand constraint
-for k, truck in enumerate(trucks):
-    truck_max_weight = int(truck['truck_max_weight'])
-    prob += pulp.lpSum(order['Total Weight'] * pulp.lpSum(x[(str(order['Destination Code']), j, k)] for j in locations) for order in orders ) <= truck_max_weight * I[k], f"Demand_{k}"
-
-# Each vehicle should leave the depot once
-for k in range(len(trucks)):
-    prob += pulp.lpSum(x[(depot1, j, k)] for j in loc_without_depot) == 1, f"Leave_Depot_{k}"
-
-# # Each vehicle arrives at a customer should leave for another destination
-# for h in customers:
-#     for k in range(len(trucks)):
-#         prob += (pulp.lpSum(x[(i, h, k)] for i in locations) - pulp.lpSum(x[(h, j, k)] for j in locations)) == 0, f"customer_source_to_dest_{h}_{k}"
-
-# Each vehicle should arrive at the depot once
-for k in range(len(trucks)):
-    prob += pulp.lpSum(x[(i, depot1, k)] for i in loc_without_depot) == 1, f"Arrive_Depot_{k}"
-
-# Time window constraints
-for k in range(len(trucks)):
-    for i in locations:
-        start_window = locations_df.loc[locations_df['location_code'] == i, 'start_minutes'].values[0]
-        end_window = locations_df.loc[locations_df['location_code'] == i, 'end_minutes'].values[0]
-        prob += t[(i, k)] >= start_window, f"Start_Window_{i}_{k}"
-        prob += t[(i, k)] <= end_window, f"End_Window_{i}_{k}"
-
-# Service time and travel time constraints
-for k in range(len(trucks)):
-    for i in locations:
-        for j in locations:
-            if i != j and (i, j, k) in x:
-                travel_time = travel_matrix.get((i, j), {}).get('travel_time_in_min', 0)
-                service_time = service_time_customer if i != depot1 and j != depot1 else service_time_depot
-                prob += t[(j, k)] >= t[(i, k)] + service_time + travel_time - 1e5 * (1 - x[(i, j, k)]), f"Service_Time_{i}_{j}_{k}"
-
-# Allowed truck types constraint
-for k, truck in enumerate(trucks):
-    truck_type = truck['truck_type']
-    for i in locations:
-        allowed_trucks_i = eval(locations_df.loc[locations_df['location_code'] == i, 'trucks_allowed'].values[0])
-        for j in locations:
-            allowed_trucks_j = eval(locations_df.loc[locations_df['location_code'] == j, 'trucks_allowed'].values[0])
-            if truck_type in allowed_trucks_i and allowed_trucks_j:
-                prob += x[(i, j, k)] <= 1, f"Allowed_Truck_{i}_{j}_{k}"
-# Linking constraint
-for k in range(len(trucks)):
-    for i in locations:
-        for j in locations:
-                prob += I[k] >= x[(i, j, k)], f"Linking_{i}_{j}_{k}"
-
-# Solve the problem
-prob.solve(GUROBI(Heuristics=0.5,MIPFocus=1,MIPGap=0.02))
-
-# Extract solution
-solution = {}
-if pulp.LpStatus[prob.status] == 'Optimal':
-    for k in range(len(trucks)):
-        solution[trucks[k]['truck_id']] = []
-        for i in locations:
-            for j in locations:
-                if pulp.value(x[(i, j, k)]) > 0:
-                    solution[trucks[k]['truck_id']].append((i, j, pulp.value(t[(i, k)])))
+service_time_customer = 20
+service_time_depot = 60
+
+backend = 'pulp'  # 'pulp', 'highs' (sparse constraint matrices solved by scipy.optimize.milp) or 'ortools' (routing heuristic)
+mip_start = True  # pulp backend: start the MILP from the OR-Tools routes (scipy's milp takes no start solution)
+ortools_seconds = 5
+arc_filter = True  # Only create x[i, j, k] for arcs truck k may drive and can reach within j's time window
+# Identical trucks (same type and capacity): 'trucks' models each truck separately, 'symmetry' adds
+# ordering rows between identical trucks, 'types' has one set of variables per class (highs backend only)
+fleet = 'trucks'
+tight = True  # Big-M per arc from the time windows, and one linking row per truck and location instead of per arc
+if fleet == 'types' and backend != 'highs':
+    raise ValueError("fleet = 'types' is only implemented for backend = 'highs'")
+run['info'].update(backend=backend, fleet=fleet, tight=tight, trucks=len(data.truck_ids), truck_classes=int(data.truck_class.max()) + 1)
+
+
+def build_model(data, arc_mask=None, symmetry=False, tight=False):
+    # Initialize the problem
+    prob = pulp.LpProblem("CVRPTW", pulp.LpMinimize)
+    locations = data.locations
+    n, n_trucks, depot = len(locations), len(data.truck_weight), data.depot
+    filtered = arc_mask is not None
+    if not filtered:
+        arc_mask = np.ones((n_trucks, n, n), dtype=bool)
+    arcs = list(zip(*(a.tolist() for a in np.nonzero(arc_mask))))
+
+    # Create decision variables, keyed by location codes; out_arcs / in_arcs list each location's arcs per truck
+    x = {}
+    t = {}
+    I = {}
+    out_arcs = {(i, k): [] for i in range(n) for k in range(n_trucks)}
+    in_arcs = {(i, k): [] for i in range(n) for k in range(n_trucks)}
+
+    for k in range(n_trucks):
+        I[k] = pulp.LpVariable(f'I_{k}', cat='Binary')
+        for i in range(n):
+            t[(locations[i], k)] = pulp.LpVariable(f't_{locations[i]}_{k}', lowBound=0, cat='Continuous')
+    for k, i, j in arcs:
+        var = pulp.LpVariable(f'x_{locations[i]}_{locations[j]}_{k}', cat='Binary')
+        x[(locations[i], locations[j], k)] = var
+        out_arcs[(i, k)].append((j, var))
+        in_arcs[(j, k)].append((i, var))
+
+    # Objective function: Minimize total distance and fixed costs
+    prob += pulp.lpSum(
+        data.distance[i, j] * x[(locations[i], locations[j], k)] * (20000 - int(data.truck_weight[k]) / 1000)
+        for k, i, j in arcs
+    )+pulp.lpSum(
+        int(data.truck_weight[k]) * 2 * I[k]
+        for k in range(n_trucks)
+    ), "Minimize_Total_Cost"
+
+    # Flow balancing constraint
+    for u, i in zip(data.order_invoice, data.order_location.tolist()):
+        if i != depot:
+            prob += pulp.lpSum(var for k in range(n_trucks) for _, var in out_arcs[(i, k)])==pulp.lpSum(var for k in range(n_trucks) for _, var in in_arcs[(i, k)])==1, f"Flow_Balancing_{u}"
+
+    # Per-truck flow conservation: a truck that arrives at a location leaves it again, so each truck's
+    # arcs form one walk from the depot (as in sparse_milp.build_cvrptw_milp); self-loops are fixed to 0
+    for (i, k), leaving in out_arcs.items():
+        if leaving or in_arcs[(i, k)]:
+            prob += pulp.lpSum(var for _, var in in_arcs[(i, k)]) == pulp.lpSum(var for _, var in leaving), f"Truck_Flow_{locations[i]}_{k}"
+    for k, i, j in arcs:
+        if i == j:
+            prob += x[(locations[i], locations[j], k)] == 0, f"No_Self_Loop_{locations[i]}_{k}"
+
+    # demand constraint
+    for k in range(n_trucks):
+        prob += pulp.lpSum(data.location_weight[i] * var for i in range(n) for _, var in out_arcs[(i, k)]) <= int(data.truck_weight[k]) * I[k], f"Demand_{k}"
+
+    # Each vehicle should leave the depot once
+    for k in range(n_trucks):
+        prob += pulp.lpSum(var for j, var in out_arcs[(depot, k)] if j != depot) == 1, f"Leave_Depot_{k}"
+
+    # Each vehicle should arrive at the depot once
+    for k in range(n_trucks):
+        prob += pulp.lpSum(var for i, var in in_arcs[(depot, k)] if i != depot) == 1, f"Arrive_Depot_{k}"
+
+    # Time window constraints
+    for k in range(n_trucks):
+        for i in range(n):
+            prob += t[(locations[i], k)] >= int(data.start_minutes[i]), f"Start_Window_{locations[i]}_{k}"
+            prob += t[(locations[i], k)] <= int(data.end_minutes[i]), f"End_Window_{locations[i]}_{k}"
+
+    # Service time and travel time constraints (tight: big-M per arc, rows that can never bind left out).
+    # Arcs back into the depot get none: with one t per truck at the depot, no closed route could satisfy it
+    big_m = arc_big_m(data.travel_time, data.start_minutes, data.end_minutes, depot, service_time_customer, service_time_depot) if tight else np.full((n, n), 1e5)
+    for k, i, j in arcs:
+        if i != j and j != depot and big_m[i, j] > 0:
+            service_time = service_time_customer if i != depot and j != depot else service_time_depot
+            prob += t[(locations[j], k)] >= t[(locations[i], k)] + service_time + data.travel_time[i, j] - float(big_m[i, j]) * (1 - x[(locations[i], locations[j], k)]), f"Service_Time_{locations[i]}_{locations[j]}_{k}"
+
+    # Allowed truck types constraint (with an arc filter, disallowed arcs have no variable at all)
+    if not filtered:
+        for k, i, j in arcs:
+            if data.allowed_mask[i] >> data.truck_type[k] & 1 and data.allowed_mask[j]:
+                prob += x[(locations[i], locations[j], k)] <= 1, f"Allowed_Truck_{locations[i]}_{locations[j]}_{k}"
+    # Linking constraint (tight: a truck leaves each location at most once, one row per truck and location)
+    if tight:
+        for (i, k), leaving in out_arcs.items():
+            if leaving:
+                prob += I[k] >= pulp.lpSum(var for _, var in leaving), f"Linking_{locations[i]}_{k}"
+    else:
+        for k, i, j in arcs:
+            prob += I[k] >= x[(locations[i], locations[j], k)], f"Linking_{locations[i]}_{locations[j]}_{k}"
+
+    # Symmetry breaking: of two identical trucks, the first is used if the second is and starts at a lower location index
+    if symmetry:
+        trucks_by_class = np.lexsort((np.arange(n_trucks), data.truck_class)).tolist()
+        for a, b in zip(trucks_by_class, trucks_by_class[1:]):
+            if data.truck_class[a] == data.truck_class[b]:
+                prob += I[a] >= I[b], f"Symmetry_Used_{a}_{b}"
+                prob += pulp.lpSum(j * var for j, var in out_arcs[(depot, a)] if j != depot) + 1 <= pulp.lpSum(j * var for j, var in out_arcs[(depot, b)] if j != depot), f"Symmetry_Order_{a}_{b}"
+
+    return prob, x, t, I
+
+
+def build_sparse_model(data, arc_mask=None):
+    # Same model as build_model, as NumPy arrays over the location list
+    if fleet == 'types':
+        return build_cvrptw_milp_by_type(
+            data.distance, data.travel_time, data.start_minutes, data.end_minutes,
+            data.location_weight, data.truck_weight, data.truck_class,
+            data.depot, service_time_customer, service_time_depot, big_m=None if tight else 1e5, arc_mask=arc_mask,
+        )
+    return build_cvrptw_milp(
+        data.distance, data.travel_time, data.start_minutes, data.end_minutes,
+        data.location_weight, data.truck_weight,
+        data.depot, service_time_customer, service_time_depot, big_m=None if tight else 1e5, arc_mask=arc_mask,
+        truck_class=data.truck_class if fleet == 'symmetry' else None, linking='degree' if tight else 'arc',
+    )
+
+
+arc_mask = None
+if arc_filter and backend != 'ortools':
+    with phase(run, 'arc_filter'):
+        arc_mask, removed = feasible_arc_mask(
+            data.travel_time, data.start_minutes, data.end_minutes,
+            allowed_trucks(data.allowed_mask, data.truck_type),
+            data.depot, service_time_customer, service_time_depot,
+        )
+    run['info']['arc_filter'] = report_arc_reduction(arc_mask, removed)
+
+# Routing heuristic: the solution of the 'ortools' backend, or the MIP start of the pulp model
+routes = None
+if backend == 'ortools' or (backend == 'pulp' and mip_start):
+    with phase(run, 'ortools'):
+        routes, heuristic_objective = solve_cvrptw_routing(data, ortools_seconds, service_time_customer, service_time_depot)
+    run['info']['ortools_objective'] = heuristic_objective
+    print(f"OR-Tools: {len(routes) if routes else 0} routes in {ortools_seconds} s, objective {heuristic_objective}")
+
+if backend == 'ortools':
+    status = 'Feasible' if routes else 'Not Solved'
+    if routes:
+        solution = {data.truck_ids[k]: [(locations[i], arrival) for i, arrival in route] for k, route in routes.items()}
+    else:
+        solution = "No solution found."
+elif backend == 'highs':
+    with phase(run, 'build_model'):
+        model, build_seconds, build_peak_mb = measure_build(build_sparse_model, data, arc_mask)
+    print(f"Sparse build: {build_seconds:.2f} s, peak {build_peak_mb:.1f} MB, "
+          f"{model['A'].shape[1]} variables, {model['A'].shape[0]} constraints")
+    run['info'].update(variables=model['A'].shape[1], constraints=model['A'].shape[0])
+    with phase(run, 'root_lp'):
+        run['info']['root_lp_bound'] = lp_relaxation_bound(model)
+    with phase(run, 'solve'):
+        result = solve_milp_model(model, mip_rel_gap=0.02)
+    status = 'Optimal' if result.status == 0 else result.message
+    run['info'].update(objective=result.fun, mip_nodes=getattr(result, 'mip_node_count', None),
+                       mip_dual_bound=getattr(result, 'mip_dual_bound', None))
+    print(f"Root LP bound {run['info']['root_lp_bound']}, {run['info']['mip_nodes']} nodes")
+
+    # Extract solution
+    solution = {}
+    if result.x is not None:
+        for k, route in cvrptw_routes_from_solution(model, result).items():
+            solution[data.truck_ids[k]] = [(locations[i], arrival) for i, arrival in route]
+    else:
+        solution = "No optimal solution found."
 else:
-    solution = "No optimal solution found."
+    with phase(run, 'build_model'):
+        (prob, x, t, I), build_seconds, build_peak_mb = measure_build(build_model, data, arc_mask, fleet == 'symmetry', tight)
+    print(f"PuLP build: {build_seconds:.2f} s, peak {build_peak_mb:.1f} MB, "
+          f"{len(prob.variables())} variables, {len(prob.constraints)} constraints")
+    run['info'].update(variables=len(prob.variables()), constraints=len(prob.constraints))
+    if routes:
+        missing = set_mip_start(x, t, I, routes, locations, data.start_minutes)
+        print(f"MIP start from the OR-Tools routes ({missing} route arcs without a variable)")
+
+    # Solve the problem
+    log_path = 'cvrptw_solver.log'
+    with phase(run, 'solve'):
+        prob.solve(GUROBI(Heuristics=0.5,MIPFocus=1,MIPGap=0.02,warmStart=bool(routes),logPath=log_path))
+    read_solver_log(run, log_path)
+    status = pulp.LpStatus[prob.status]
+
+    # Extract solution
+    solution = {}
+    if pulp.LpStatus[prob.status] == 'Optimal':
+        with phase(run, 'extract_solution'):
+            for k, route in cvrptw_routes(x, t, locations, len(data.truck_ids), depot1).items():
+                solution[data.truck_ids[k]] = route
+    else:
+        solution = "No optimal solution found."
 
 print(solution)
 # Print solver status
-print(f"Status: {pulp.LpStatus[prob.status]}")
+print(f"Status: {status}")
+print(f'Telemetry saved to {write_run(run)}')
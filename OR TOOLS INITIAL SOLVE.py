@@ -1,7 +1,8 @@
 import pandas as pd
-from haversine import haversine
-from ortools.constraint_solver import routing_enums_pb2
-from ortools.constraint_solver import pywrapcp
+from distance_cache import cached_distance_matrix
+from candidate_graph import top_k_candidates
+from ortools_tsp import solve_tsp_ortools, solve_tsp_portfolio
+from telemetry import new_run, phase, write_run
 
 def read_data(file_path):
     df = pd.read_csv(file_path)
@@ -9,44 +10,39 @@ def read_data(file_path):
     coordinates = list(zip(df['Latitude'], df['Longitude']))
     return places, coordinates
 
-def calculate_distance_matrix(coordinates):
-    n = len(coordinates)
-    distance_matrix = [[0.0] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                distance_matrix[i][j] = haversine(coordinates[i], coordinates[j])
-    return distance_matrix
-
 data_file_path = 'C:/Users/Acer/Downloads/tsp_input_70.csv'
 places, coordinates = read_data(data_file_path)
 
 def create_data_model():
     """Stores the data for the problem."""
     data = {}
-    data["distance_matrix"] = calculate_distance_matrix(coordinates)
+    data["candidate_k"] = None  # e.g. 10: search only k-nearest-neighbor arcs, no n x n matrix (large instances)
+    if data["candidate_k"]:
+        data["candidates"] = top_k_candidates(coordinates, data["candidate_k"])
+        data["distance_matrix"] = None
+    else:
+        data["candidates"] = None
+        data["distance_matrix"] = cached_distance_matrix(coordinates)
     data["num_vehicles"] = 1
     data["depot"] = 0
+    # Portfolio: run the first solution strategy / metaheuristic / seed mixes of ortools_tsp.PORTFOLIO
+    # in a process pool for portfolio_seconds of wall clock and keep the best tour
+    data["portfolio"] = False
+    data["portfolio_seconds"] = 30
     return data
 
-def print_solution(manager, routing, solution, places):
+def print_solution(tour, objective, places):
     """Prints solution on console and saves to CSV."""
-    print(f"Objective: {solution.ObjectiveValue()/1000} kms")
-    index = routing.Start(0)
+    print(f"Objective: {objective} kms")
     plan_output = "Route for vehicle 0:\n"
-    route_distance = 0
     sequence = []
-    while not routing.IsEnd(index):
-        place_index = manager.IndexToNode(index)
+    for place_index in tour:
         sequence.append((place_index, places[place_index]))
         plan_output += f" {place_index} ->"
-        previous_index = index
-        index = solution.Value(routing.NextVar(previous_index))
-        route_distance += routing.GetArcCostForVehicle(previous_index, index, 0)
-    place_index = manager.IndexToNode(index)
+    place_index = tour[0]
     sequence.append((place_index, places[place_index]))
     plan_output += f" {place_index}\n"
-    plan_output += f"Route distance: {route_distance / 1000.0} kms\n"  # Convert meters to miles
+    plan_output += f"Route distance: {objective} kms\n"
     print(plan_output)
 
     # Save to CSV
@@ -54,44 +50,38 @@ def print_solution(manager, routing, solution, places):
     df_solution.to_csv('tsp_solution_702.csv', index=False)
     print("Solution saved to tsp_solution.csv")
 
+
 def main():
     """Entry point of the program."""
-    # Instantiate the data problem.
-    data = create_data_model()
-
-    # Create the routing index manager.
-    manager = pywrapcp.RoutingIndexManager(
-        len(data["distance_matrix"]), data["num_vehicles"], data["depot"]
-    )
-
-    # Create Routing Model.
-    routing = pywrapcp.RoutingModel(manager)
-
-    def distance_callback(from_index, to_index):
-        """Returns the distance between the two nodes."""
-        # Convert from routing variable Index to distance matrix NodeIndex.
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return int(data["distance_matrix"][from_node][to_node] * 1000) 
+    run = new_run('ortools_tsp')  # Phase timings and the cost of every solution found, see telemetry.py
 
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-
-    # Define cost of each arc.
-    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
-
-    # Setting first solution heuristic.
-    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-    search_parameters.first_solution_strategy = (
-        routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-    )
-
-    # Solve the problem.
-    solution = routing.SolveWithParameters(search_parameters)
+    # Instantiate the data problem.
+    with phase(run, 'distance_matrix'):
+        data = create_data_model()
+
+    if data["portfolio"]:
+        with phase(run, 'solve'):
+            tour, objective, run['portfolio'] = solve_tsp_portfolio(
+                len(places), distance_matrix=data["distance_matrix"], candidates=data["candidates"],
+                coordinates=coordinates, depot=data["depot"], time_limit=data["portfolio_seconds"],
+            )
+        run['info'].update(n=len(places), candidate_k=data["candidate_k"])
+        for result in sorted(run['portfolio'], key=lambda r: (r['objective'] is None, r['objective'] or 0)):
+            print(f"{result['first_solution_strategy']:>28} {result['local_search_metaheuristic']:>20} "
+                  f"seed {result['seed']}: {result['objective']} kms in {result['seconds']} s ({result['status']})")
+    else:
+        # Solve the problem (PATH_CHEAPEST_ARC first solution, as before).
+        with phase(run, 'solve'):
+            tour, objective = solve_tsp_ortools(
+                len(places), distance_matrix=data["distance_matrix"], candidates=data["candidates"],
+                coordinates=coordinates, depot=data["depot"], trajectory=run['trajectory'],
+            )
 
     # Print solution on console.
-    if solution:
-        print_solution(manager, routing, solution, places)
+    if tour:
+        with phase(run, 'print_solution'):
+            print_solution(tour, objective, places)
+    print(f'Telemetry saved to {write_run(run)}')
 
 if __name__ == '__main__':
     main()
-
@@ -1,8 +1,13 @@
 import pandas as pd
-from haversine import haversine
+from distance_cache import cached_distance_matrix
 import pulp
 from pulp import GLPK, GUROBI
-import folium
+from route_extraction import tsp_tour
+from tsp_subtour import solve_with_lazy_subtours
+from sparse_milp import build_tsp_milp, measure_build, solve_milp_model, tour_from_solution
+from tsp_race import race_tsp
+from route_map import route_map
+from telemetry import new_run, phase, read_solver_log, write_run
 
 
 def read_data(file_path):
@@ -12,17 +17,7 @@ def read_data(file_path):
     return places, coordinates
 
 
-def calculate_distance_matrix(coordinates):
-    n = len(coordinates)
-    distance_matrix = [[0.0] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                distance_matrix[i][j] = haversine(coordinates[i], coordinates[j])
-    return distance_matrix
-
-
-def build_model(places, distance_matrix):
+def build_model(places, distance_matrix, subtour='mtz'):
     # instantiate the problem - Python PuLP model
     prob = pulp.LpProblem("TSP", pulp.LpMinimize)
 
@@ -65,43 +60,43 @@ def build_model(places, distance_matrix):
                 aux_sum += x[(i, j)]
         prob += aux_sum == 1, 'Incoming_sum_' + str(j)
 
-    # Sub-tour elimination constraint
-    for i in range(1, len(places)):
-        for j in range(1, len(places)):
-            if i != j:
-                prob += s[j] >= 1 + s[i] - (len(places)) * (1-x[(i, j)]), 'sub_tour_' + str(i) + '_' + str(j)
+    # Sub-tour elimination constraint (MTZ); with subtour='lazy' DFJ cuts are added while solving
+    if subtour == 'mtz':
+        for i in range(1, len(places)):
+            for j in range(1, len(places)):
+                if i != j:
+                    prob += s[j] >= 1 + s[i] - (len(places)) * (1-x[(i, j)]), 'sub_tour_' + str(i) + '_' + str(j)
 
     return prob, x
 
 
-def solve_tsp(prob, x, places):
+def solve_tsp(prob, x, places, subtour='mtz', run=None):
     # Solve the problem
     solver = 'CBC'  # Solver choice; 'CBC', 'GUROBI', 'GLPK'
     print('-' * 50)
     print('Optimization solver', solver, 'called')
+    log_path = 'tsp_solver.log'
     # prob.writeLP("../output/tsp.lp")
     if solver == 'CBC':
-        prob.solve(pulp.PULP_CBC_CMD())
+        solver_cmd = pulp.PULP_CBC_CMD(logPath=log_path)
     elif solver == 'GUROBI':
-        prob.solve(GUROBI())
+        solver_cmd = GUROBI(logPath=log_path)
     elif solver == 'GLPK':
-        prob.solve(GLPK())
+        solver_cmd = GLPK()
     else:
         print(solver, ' not available')
         exit()
+    with phase(run, 'solve'):
+        if subtour == 'lazy':
+            solve_with_lazy_subtours(prob, x, len(places), solver_cmd)
+        else:
+            prob.solve(solver_cmd)
     print(f'Status: {pulp.LpStatus[prob.status]}')
+    if solver != 'GLPK':
+        read_solver_log(run, log_path)
 
     if pulp.LpStatus[prob.status] == 'Optimal':
-        n = len(places)
-        optimal_route = [0]
-        i = 0
-        while len(optimal_route) < n:
-            for j in range(n):
-                if i!= j and pulp.value(x[i, j]) == 1:
-                    optimal_route.append(j)
-                    i = j
-                    break
-        optimal_route.append(0)
+        optimal_route = tsp_tour(x, len(places))
 
         total_distance = pulp.value(prob.objective)
 
@@ -113,31 +108,77 @@ def solve_tsp(prob, x, places):
         print("No optimal solution found.")
         return None, None
 
-def plot_route(optimal_route, coordinates, places):
-    # Create a map centered around the first place
-    start_coord = coordinates[places.index(optimal_route[0])]
-    m = folium.Map(location=start_coord, zoom_start=6)
+def solve_tsp_sparse(model, places):
+    print('-' * 50)
+    print('Optimization solver HiGHS (scipy.optimize.milp) called')
+    result = solve_milp_model(model)
+    print(f'Status: {result.message}')
+
+    if result.status == 0:
+        optimal_route = tour_from_solution(model, result)
+        total_distance = result.fun
+
+        print("Optimal Route:", " -> ".join(places[i] for i in optimal_route))
+        print("Total Distance:", total_distance)
+
+        return [places[i] for i in optimal_route], total_distance
+    else:
+        print("No optimal solution found.")
+        return None, None
+
+def solve_tsp_race(distance_matrix, places, time_limit=600, run=None):
+    print('-' * 50)
+    print('Optimization solvers OR-Tools, CBC, HiGHS and GLPK raced')
+    optimal_route, total_distance, report = race_tsp(distance_matrix, time_limit=time_limit)
+    if run is not None:
+        run['race'] = report
+    for engine, result in report['engines'].items():
+        print(f"{engine}: {result['status']}, {result.get('length')} km in {result.get('seconds')} s")
+    print(f"Best tour from {report['winner']}, proved optimal by {report['proved_by']}")
+
+    if optimal_route:
+        optimal_route = optimal_route + optimal_route[:1]
+        print("Optimal Route:", " -> ".join(places[i] for i in optimal_route))
+        print("Total Distance:", total_distance)
 
-    # Add markers for each place with tooltips
-    for idx in optimal_route:
-        folium.Marker(
-            location=coordinates[places.index(idx)],
-            popup=coordinates[places.index(idx)],
-            tooltip=coordinates[places.index(idx)]
-        ).add_to(m)
+        return [places[i] for i in optimal_route], total_distance
+    else:
+        print("No solution found.")
+        return None, None
 
-    # Add lines to show the route
-    route_coords = [coordinates[places.index(i)] for i in optimal_route]
-    folium.PolyLine(locations=route_coords, color='blue').add_to(m)
+def plot_route(optimal_route, coordinates, places, mode='auto'):
+    # One clustered marker layer and one polyline for large tours, see route_map.route_map
+    m = route_map(optimal_route, coordinates, places, mode=mode)
 
     # Save the map
     m.save('C:/Users/Acer/Downloads/tsp_route_10.html')
 
 
-data_file_path = 'C:/Users/Acer/Downloads/tsp_input.csv'
-places, coordinates = read_data(data_file_path)
-distance_matrix = calculate_distance_matrix(coordinates)
-problem, x = build_model(places, distance_matrix)
-optimal_route, total_distance = solve_tsp(problem, x, places)
-if optimal_route:
-    plot_route(optimal_route, coordinates, places)
+if __name__ == '__main__':
+    data_file_path = 'C:/Users/Acer/Downloads/tsp_input.csv'
+    run = new_run('TSP_CODE')  # Phase timings and solver progress, written to telemetry_*.json
+    with phase(run, 'read_data'):
+        places, coordinates = read_data(data_file_path)
+    with phase(run, 'distance_matrix'):
+        distance_matrix = cached_distance_matrix(coordinates)
+    subtour_mode = 'mtz'  # 'mtz' or 'lazy' (DFJ cuts added only for the subtours found)
+    backend = 'pulp'  # 'pulp', 'highs' (MTZ model as sparse matrices, solved by scipy.optimize.milp) or 'race'
+    race_seconds = 600  # race: OR-Tools, CBC, HiGHS and GLPK in parallel processes until one proves optimality
+    if backend == 'race':
+        with phase(run, 'solve'):
+            optimal_route, total_distance = solve_tsp_race(distance_matrix, places, time_limit=race_seconds, run=run)
+    elif backend == 'highs':
+        with phase(run, 'build_model'):
+            model, build_seconds, build_peak_mb = measure_build(build_tsp_milp, distance_matrix)
+        print(f"Sparse build: {build_seconds:.2f} s, peak {build_peak_mb:.1f} MB")
+        with phase(run, 'solve'):
+            optimal_route, total_distance = solve_tsp_sparse(model, places)
+    else:
+        with phase(run, 'build_model'):
+            (problem, x), build_seconds, build_peak_mb = measure_build(build_model, places, distance_matrix, subtour=subtour_mode)
+        print(f"PuLP build: {build_seconds:.2f} s, peak {build_peak_mb:.1f} MB")
+        optimal_route, total_distance = solve_tsp(problem, x, places, subtour=subtour_mode, run=run)
+    if optimal_route:
+        with phase(run, 'plot_route'):
+            plot_route(optimal_route, coordinates, places)
+    print(f'Telemetry saved to {write_run(run)}')
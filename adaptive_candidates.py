@@ -0,0 +1,216 @@
+import math
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import (breadth_first_order, connected_components, maximum_bipartite_matching,
+                                  minimum_spanning_tree)
+from scipy.spatial import cKDTree
+
+from candidate_graph import (CandidateArcs, arc_tails, radius_candidates, top_k_candidates, union_arcs,
+                             unit_sphere_points)
+from tsp_distance import haversine_pairs
+from warm_start import include_tour_arcs
+
+ALPHA_POOL = 3  # Alpha values are computed over the ALPHA_POOL * k nearest neighbors of each city (at least 10)
+
+
+def hamiltonian_checks(arcs):
+    """
+    Cheap necessary conditions for the arc set to contain a tour: every city has an outgoing and
+    an incoming arc, the graph is strongly connected, and the degree constraints alone are
+    feasible (a perfect matching of tails to heads). Returns a dict with 'passed'.
+    """
+    n = len(arcs.indptr) - 1
+    graph = coo_matrix((np.ones(len(arcs.heads)), (arc_tails(arcs), arcs.heads)), shape=(n, n)).tocsr()
+    out_degree = np.diff(arcs.indptr)
+    in_degree = np.bincount(arcs.heads, minlength=n)
+    strongly_connected = connected_components(graph, directed=True, connection='strong')[0] == 1
+    perfect_matching = bool((maximum_bipartite_matching(graph, perm_type='column') >= 0).all())
+    checks = {
+        'min_out_degree': int(out_degree.min()) if n else 0,
+        'min_in_degree': int(in_degree.min()) if n else 0,
+        'strongly_connected': bool(strongly_connected),
+        'perfect_matching': perfect_matching,
+    }
+    checks['passed'] = (checks['min_out_degree'] >= 1 and checks['min_in_degree'] >= 1
+                        and strongly_connected and perfect_matching)
+    return checks
+
+
+def _connect_components(coordinates, points, tree, tails, heads, lengths, cities):
+    """
+    Adds the shortest edge from every component but the largest to another component (Boruvka
+    steps with KD-tree queries) until the edges span `cities`. Returns the extended edge arrays.
+    """
+    n = len(points)
+    while True:
+        graph = coo_matrix((np.ones(len(tails)), (tails, heads)), shape=(n, n))
+        labels = connected_components(graph, directed=False)[1]
+        largest = np.argmax(np.bincount(labels[cities]))
+        queries = cities[labels[cities] != largest]
+        if len(queries) == 0:
+            return tails, heads, lengths
+        in_set = np.zeros(n + 1, dtype=bool)
+        in_set[cities] = True
+        k = min(n, 16)
+        while True:
+            _, idx = tree.query(points[queries], k=k)
+            idx = idx.reshape(len(queries), -1)
+            valid = in_set[idx] & (labels[np.minimum(idx, n - 1)] != labels[queries][:, None])
+            if valid.any(axis=1).all() or k == n:
+                break
+            k = min(n, k * 4)
+        found = valid.any(axis=1)
+        sources = queries[found]
+        targets = idx[found, np.argmax(valid[found], axis=1)]
+        length = haversine_pairs(coordinates, sources, targets)
+        # Shortest outgoing edge per component
+        order = np.lexsort((length, labels[sources]))
+        first = order[np.unique(labels[sources][order], return_index=True)[1]]
+        tails = np.concatenate((tails, sources[first]))
+        heads = np.concatenate((heads, targets[first]))
+        lengths = np.concatenate((lengths, length[first]))
+
+
+def _path_max(parent, weight, depth, a, b):
+    """Largest edge weight on the tree path between a[i] and b[i], by binary lifting."""
+    levels = max(1, int(depth.max()).bit_length())
+    up, top = [parent], [weight]
+    for _ in range(1, levels):
+        up.append(up[-1][up[-1]])
+        top.append(np.maximum(top[-1], top[-1][up[-2]]))
+    a, b = a.copy(), b.copy()
+    swap = depth[a] < depth[b]
+    a[swap], b[swap] = b[swap], a[swap]
+    result = np.zeros(len(a))
+    diff = depth[a] - depth[b]
+    for level in range(levels):
+        step = (diff >> level) & 1 == 1
+        result[step] = np.maximum(result[step], top[level][a[step]])
+        a[step] = up[level][a[step]]
+    for level in reversed(range(levels)):
+        apart = up[level][a] != up[level][b]
+        result[apart] = np.maximum(result[apart], np.maximum(top[level][a[apart]], top[level][b[apart]]))
+        a[apart], b[apart] = up[level][a[apart]], up[level][b[apart]]
+    apart = a != b
+    result[apart] = np.maximum(result[apart], np.maximum(weight[a[apart]], weight[b[apart]]))
+    return result
+
+
+def alpha_candidates(coordinates, k=5, tree=None):
+    """
+    Returns the arcs from every city to its k alpha-nearest cities (LKH's candidate rule, without
+    its subgradient ascent). The minimum 1-tree is the minimum spanning tree of cities 1..n-1 plus
+    the two shortest edges of city 0; alpha(i, j) is how much longer the cheapest 1-tree containing
+    edge i-j is: d(i, j) minus the longest edge on the tree path from i to j, or minus the second
+    shortest edge at city 0. Ties go to the shorter arc. Alpha is only computed for the
+    ALPHA_POOL * k nearest neighbors of each city, so no n x n matrix is needed.
+    """
+    n = len(coordinates)
+    k = min(k, n - 1)
+    if n <= 3 or k >= n - 1:
+        return top_k_candidates(coordinates, k, tree=tree)
+    points = unit_sphere_points(coordinates)
+    tree = tree or cKDTree(points)
+    pool = top_k_candidates(coordinates, min(n - 1, max(ALPHA_POOL * k, 10)), tree=tree)
+    pool_tails = arc_tails(pool)
+
+    # Minimum spanning tree of cities 1..n-1 over the pool edges, joined up if the pool is disconnected
+    inner = (pool_tails != 0) & (pool.heads != 0)
+    tails, heads, lengths = _connect_components(
+        coordinates, points, tree, pool_tails[inner], pool.heads[inner], pool.lengths[inner], np.arange(1, n)
+    )
+    # One entry per edge (a COO matrix sums duplicates); zero-length edges (duplicate cities) would vanish
+    edges, first = np.unique(np.minimum(tails, heads) * n + np.maximum(tails, heads), return_index=True)
+    mst = minimum_spanning_tree(coo_matrix((lengths[first] + 1e-9, (edges // n, edges % n)), shape=(n, n)).tocsr())
+    mst = (mst + mst.T).tocsr()
+    order, predecessors = breadth_first_order(mst, 1, directed=False)
+    parent = np.where(predecessors >= 0, predecessors, np.arange(n))
+    parent[0] = 0
+    weight = np.zeros(n)
+    weight[order[1:]] = np.asarray(mst[order[1:], parent[order[1:]]]).ravel() - 1e-9
+    depth = np.zeros(n, dtype=np.int64)
+    for city in order[1:].tolist():
+        depth[city] = depth[parent[city]] + 1
+
+    # Both directions of the pool edges and of the edges that joined a disconnected pool
+    joined = slice(int(inner.sum()), len(tails))
+    pair_tails = np.concatenate((pool_tails, tails[joined]))
+    pair_heads = np.concatenate((pool.heads, heads[joined]))
+    pair_lengths = np.concatenate((pool.lengths, lengths[joined]))
+    pairs, first = np.unique(np.minimum(pair_tails, pair_heads) * n + np.maximum(pair_tails, pair_heads), return_index=True)
+    all_tails = np.concatenate((pairs // n, pairs % n))
+    all_heads = np.concatenate((pairs % n, pairs // n))
+    all_lengths = np.tile(pair_lengths[first], 2)
+    inner = (all_tails != 0) & (all_heads != 0)
+
+    alpha = np.zeros(len(all_heads))
+    alpha[inner] = all_lengths[inner] - _path_max(parent, weight, depth, all_tails[inner], all_heads[inner])
+    # Edges at city 0: compared with the second shortest of them
+    second = np.sort(pool.lengths[pool_tails == 0])[1]
+    alpha[~inner] = all_lengths[~inner] - second
+    alpha = np.maximum(alpha, 0)
+
+    # The k arcs of smallest (alpha, length) per city, plus every 1-tree edge both ways, so the
+    # candidate graph is always strongly connected
+    order = np.lexsort((all_lengths, alpha, all_tails))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - np.searchsorted(all_tails[order], all_tails[order])
+    depot_edges = np.sort(pool.lengths[pool_tails == 0])[:2]
+    one_tree = np.where(inner, (parent[all_tails] == all_heads) | (parent[all_heads] == all_tails),
+                        np.isin(all_lengths, depot_edges))
+    keep = np.flatnonzero((rank < k) | one_tree)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(all_tails[keep], minlength=n), out=indptr[1:])
+    keep = keep[np.lexsort((all_heads[keep], all_tails[keep]))]
+    return CandidateArcs(indptr, all_heads[keep], all_lengths[keep])
+
+
+def adaptive_candidate_arcs(coordinates, k=None, max_distance=None, alpha=True, tour=None, find_tour=None,
+                            growth=2, max_rounds=8):
+    """
+    Builds the candidate arcs of the pruned TSP models and grows them until the model is feasible:
+    k alpha-nearest (alpha=True) or nearest neighbors, and/or all arcs within max_distance km.
+
+    Each round first runs hamiltonian_checks. A graph that passes them is handed to
+    find_tour(candidates) (e.g. the OR-Tools warm start), and a tour found there proves the model
+    feasible. When the checks fail or no tour is found, k and the radius are multiplied by growth
+    and the arcs rebuilt, up to max_rounds times or until k reaches n - 1. A known tour (e.g. read
+    from CSV) is a certificate by itself: its arcs are added and no expansion is needed.
+
+    Returns (candidates, tour, report): the tour's arcs are always part of candidates, tour is None
+    if none was found, and report lists k, radius, arc count and check results of every round.
+    """
+    if k is None and max_distance is None:
+        raise ValueError('adaptive_candidate_arcs needs k and/or max_distance')
+    n = len(coordinates)
+    tree = cKDTree(unit_sphere_points(coordinates))
+    rounds = []
+    for _ in range(max_rounds):
+        arc_sets = []
+        if k is not None:
+            k = min(k, n - 1)
+            arc_sets.append(alpha_candidates(coordinates, k, tree=tree) if alpha else top_k_candidates(coordinates, k, tree=tree))
+        if max_distance is not None:
+            arc_sets.append(radius_candidates(coordinates, max_distance, tree=tree))
+        candidates = arc_sets[0] if len(arc_sets) == 1 else union_arcs(coordinates, *arc_sets)
+
+        checks = hamiltonian_checks(candidates)
+        rounds.append({'k': k, 'max_distance': max_distance, 'arcs': len(candidates.heads), **checks})
+        print(f"Candidate arcs (k={k}, max_distance={max_distance}): {len(candidates.heads)} arcs, "
+              f"checks {'passed' if checks['passed'] else 'failed'}")
+        if tour is None and checks['passed'] and find_tour is not None:
+            tour = find_tour(candidates)
+            rounds[-1]['tour_found'] = tour is not None
+        if tour is not None:
+            candidates, rounds[-1]['tour_arcs_added'] = include_tour_arcs(coordinates, candidates, tour)
+            return candidates, tour, {'feasible': True, 'rounds': rounds}
+        if checks['passed'] and find_tour is None:
+            return candidates, None, {'feasible': None, 'rounds': rounds}
+        if k is not None and k >= n - 1:
+            break  # Complete graph
+        if k is not None:
+            k = math.ceil(k * growth)
+        if max_distance is not None:
+            max_distance *= growth
+    return candidates, None, {'feasible': False, 'rounds': rounds}
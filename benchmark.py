@@ -0,0 +1,224 @@
+import argparse
+import importlib.util
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import pulp
+
+from candidate_graph import radius_candidates, top_k_candidates
+from ortools_tsp import solve_tsp_ortools
+from route_extraction import tsp_tour
+from tsp_distance import calculate_distance_matrix
+from warm_start import first_incumbent_seconds, include_tour_arcs, local_search_tour, ortools_initial_tour
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+INSTANCE_SIZES = (50, 100, 200, 500, 1000, 2000)
+
+# Largest instance each variant is run on; the full n x n MTZ models do not build beyond a few hundred cities
+VARIANTS = {
+    'mtz': 200,           # TSP_CODE.py
+    'warm_start': 200,    # tsp-warm-start.py
+    'max_distance': 2000,  # tsp-max-sol.py
+    'top_k': 2000,        # tsp-max-sol_2.py
+    'ortools': 2000,      # OR TOOLS INITIAL SOLVE.py
+}
+MAX_DISTANCE = 2000  # km, as in tsp-max-sol.py
+TOP_K = 25           # as in tsp-max-sol_2.py
+ORTOOLS_MATRIX_LIMIT = 500  # Above this the OR-Tools runs use top-k candidate arcs instead of the full matrix
+
+# Final summary of a CBC run
+_CBC_RESULT = re.compile(r'^Result - (.*)$', re.M)
+_CBC_OBJECTIVE = re.compile(r'^Objective value:\s+(\S+)', re.M)
+_CBC_BOUND = re.compile(r'^Lower bound:\s+(\S+)', re.M)
+
+
+def load_script(file_name):
+    """Imports one of the TSP scripts (their file names are not valid module names) without running it."""
+    name = os.path.splitext(file_name)[0].replace('-', '_').replace(' ', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_instance(n, seed):
+    """Returns (name, places, coordinates) of n cities drawn uniformly over India's bounding box."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(8.0, 35.0, n)
+    lng = rng.uniform(68.0, 97.0, n)
+    places = [f'City_{i}' for i in range(n)]
+    return f'random_{n}_s{seed}', places, list(zip(lat.tolist(), lng.tolist()))
+
+
+def bundled_instance():
+    df = pd.read_csv(os.path.join(HERE, 'tsp_input.csv'))
+    return 'tsp_input', df['Place_Name'].unique().tolist(), list(zip(df['Latitude'], df['Longitude']))
+
+
+def read_cbc_log(log_path):
+    """Returns (result line, objective, lower bound) from the summary of a CBC log."""
+    with open(log_path) as log_file:
+        text = log_file.read()
+    result, objective, bound = _CBC_RESULT.search(text), _CBC_OBJECTIVE.search(text), _CBC_BOUND.search(text)
+    return (
+        result.group(1).strip() if result else None,
+        float(objective.group(1)) if objective else None,
+        float(bound.group(1)) if bound else None,
+    )
+
+
+def initial_tour(places, coordinates, distance_matrix=None):
+    """Warm-start tour as the scripts build it: OR-Tools on the full matrix, or local search beyond ORTOOLS_MATRIX_LIMIT."""
+    if len(places) <= ORTOOLS_MATRIX_LIMIT:
+        if distance_matrix is None:
+            distance_matrix = calculate_distance_matrix(coordinates)
+        return ortools_initial_tour(places, distance_matrix=distance_matrix)
+    return local_search_tour(coordinates)
+
+
+def solve_pulp(prob, x, n, time_limit, warm_start):
+    """Solves with CBC under the time budget; returns the solve fields of a result record."""
+    log_path = 'benchmark_cbc.log'
+    start = time.perf_counter()
+    prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, warmStart=warm_start, logPath=log_path))
+    solve_seconds = time.perf_counter() - start
+    result, objective, bound = read_cbc_log(log_path)
+    with open(log_path) as log_file:
+        first_incumbent = first_incumbent_seconds(log_file.read())
+    tour = tsp_tour(x, n) if prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible) else []
+    if len(tour) != n + 1:
+        objective = None
+    elif result and result.startswith('Optimal'):
+        bound = objective
+    gap = (objective - bound) / objective if objective and bound is not None else None
+    return {'solve_seconds': solve_seconds, 'status': result or pulp.LpStatus[prob.status],
+            'objective': objective, 'bound': bound, 'gap': gap, 'first_incumbent_seconds': first_incumbent}
+
+
+def run_variant(variant, places, coordinates, time_limit, scripts):
+    """Runs one variant on one instance and returns its result record."""
+    n = len(places)
+    record = {'variant': variant, 'n': n, 'time_limit': time_limit}
+
+    if variant == 'ortools':
+        start = time.perf_counter()
+        if n <= ORTOOLS_MATRIX_LIMIT:
+            inputs = {'distance_matrix': calculate_distance_matrix(coordinates)}
+        else:
+            inputs = {'candidates': top_k_candidates(coordinates, 10), 'coordinates': coordinates}
+        record['matrix_seconds'] = time.perf_counter() - start
+        start = time.perf_counter()
+        tour, objective = solve_tsp_ortools(n, time_limit=time_limit, **inputs)
+        record.update(build_seconds=0.0, solve_seconds=time.perf_counter() - start, variables=None,
+                      constraints=None, status='Feasible' if tour else 'Not Solved', objective=objective,
+                      bound=None, gap=None)
+        return record
+
+    # Distance matrix (full variants) or candidate arcs (pruned variants)
+    start = time.perf_counter()
+    if variant in ('mtz', 'warm_start'):
+        arcs = calculate_distance_matrix(coordinates)
+    elif variant == 'max_distance':
+        arcs = radius_candidates(coordinates, max_distance=MAX_DISTANCE)
+    else:
+        arcs = top_k_candidates(coordinates, TOP_K)
+    record['matrix_seconds'] = time.perf_counter() - start
+
+    tour = None
+    if variant != 'mtz':
+        tour, start_objective, record['start_seconds'] = initial_tour(
+            places, coordinates, arcs if variant == 'warm_start' else None)
+        record['start_objective'] = start_objective
+        if variant != 'warm_start':
+            arcs, record['arcs_added'] = include_tour_arcs(coordinates, arcs, tour)
+
+    start = time.perf_counter()
+    if variant == 'mtz':
+        prob, x = scripts['TSP_CODE.py'].build_model(places, arcs)
+    elif variant == 'warm_start':
+        prob, x = scripts['tsp-warm-start.py'].build_model(places, arcs, tour)
+    elif variant == 'max_distance':
+        prob, x = scripts['tsp-max-sol.py'].build_model(places, arcs, tour)
+    else:
+        prob, x = scripts['tsp-max-sol_2.py'].build_model(places, arcs, tour)
+    record['build_seconds'] = time.perf_counter() - start
+    record['variables'] = len(prob.variables())
+    record['constraints'] = len(prob.constraints)
+
+    record.update(solve_pulp(prob, x, n, time_limit, warm_start=tour is not None))
+    return record
+
+
+def performance_table(results):
+    """Pivots results into the layout of TSP PERFORMANCE TABLE.xlsx: one row per instance, objective and runtime per variant."""
+    df = pd.DataFrame(results)
+    df['runtime_seconds'] = df[['matrix_seconds', 'build_seconds', 'solve_seconds']].sum(axis=1)
+    table = df.pivot_table(index=['instance', 'n'], columns='variant', values=['objective', 'runtime_seconds'])
+    table = table.swaplevel(axis=1).sort_index(axis=1)
+    return table.sort_index(level='n')
+
+
+def compare_to_baseline(results, baseline):
+    """Joins results with a baseline on (instance, variant); returns a DataFrame of objective and time changes."""
+    keys = ['instance', 'variant']
+    current = pd.DataFrame(results)
+    current['total_seconds'] = current[['matrix_seconds', 'build_seconds', 'solve_seconds']].sum(axis=1)
+    previous = pd.DataFrame(baseline)
+    previous['total_seconds'] = previous[['matrix_seconds', 'build_seconds', 'solve_seconds']].sum(axis=1)
+    merged = current[keys + ['objective', 'gap', 'total_seconds']].merge(
+        previous[keys + ['objective', 'gap', 'total_seconds']], on=keys, how='left', suffixes=('', '_baseline'))
+    merged['objective_change_pct'] = 100 * (merged['objective'] / merged['objective_baseline'] - 1)
+    merged['speedup'] = merged['total_seconds_baseline'] / merged['total_seconds']
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reruns the TSP variants and records the performance table.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(INSTANCE_SIZES))
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument('--time-limit', type=float, default=300, help='solver budget per run (s)')
+    parser.add_argument('--no-bundled', action='store_true', help='skip tsp_input.csv')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help='results file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results as the new baseline')
+    parser.add_argument('--table', help='also write the performance table to this .xlsx file')
+    args = parser.parse_args()
+
+    instances = [] if args.no_bundled else [bundled_instance()]
+    instances += [synthetic_instance(n, seed) for n in args.sizes for seed in args.seeds]
+    scripts = {name: load_script(name) for name in ('TSP_CODE.py', 'tsp-warm-start.py', 'tsp-max-sol.py', 'tsp-max-sol_2.py')}
+
+    results = []
+    for name, places, coordinates in instances:
+        for variant in args.variants:
+            if len(places) > VARIANTS[variant]:
+                continue
+            print(f'--- {name}: {variant}')
+            record = {'instance': name}
+            record.update(run_variant(variant, places, coordinates, args.time_limit, scripts))
+            results.append(record)
+            print(json.dumps(record))
+            # Rewritten after every run, so an interrupted suite keeps what it measured
+            with open(args.output, 'w') as results_file:
+                json.dump(results, results_file, indent=1)
+
+    if args.table:
+        performance_table(results).to_excel(args.table)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=1)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            comparison = compare_to_baseline(results, json.load(baseline_file))
+        print(comparison.to_string(index=False, float_format=lambda v: f'{v:.3f}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from tsp_distance import EARTH_RADIUS_KM, haversine_pairs
+
+# Compressed sparse row arc set: the arcs leaving city i are heads[indptr[i]:indptr[i + 1]],
+# with their haversine lengths (km) in lengths[...] at the same positions.
+CandidateArcs = namedtuple('CandidateArcs', ['indptr', 'heads', 'lengths'])
+
+
+def unit_sphere_points(coordinates):
+    """Maps (lat, lng) degrees onto 3-D points of the unit sphere, where chord length is monotone in haversine distance."""
+    coords = np.radians(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+    lat, lng = coords[:, 0], coords[:, 1]
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+
+def _from_pairs(coordinates, n, tails, heads):
+    order = np.lexsort((heads, tails))
+    tails, heads = tails[order], heads[order]
+    lengths = haversine_pairs(coordinates, tails, heads)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tails, minlength=n), out=indptr[1:])
+    return CandidateArcs(indptr, heads, lengths)
+
+
+def top_k_candidates(coordinates, k=10, tree=None):
+    """Returns the arcs from every city to its k nearest other cities."""
+    n = len(coordinates)
+    k = min(k, n - 1)
+    if k <= 0:
+        return CandidateArcs(np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+    points = unit_sphere_points(coordinates)
+    tree = tree or cKDTree(points)
+    # Ask for one extra neighbor since each city is normally its own nearest point
+    _, idx = tree.query(points, k=k + 1)
+    rows = np.arange(n)
+    keep = idx != rows[:, None]
+    # Duplicate coordinates can push the city itself out of the first column; keep exactly k others
+    keep &= np.cumsum(keep, axis=1) <= k
+    tails = np.broadcast_to(rows[:, None], idx.shape)[keep]
+    return _from_pairs(coordinates, n, tails, idx[keep])
+
+
+def radius_candidates(coordinates, max_distance, tree=None):
+    """Returns every arc whose haversine length is at most max_distance km (the tsp-max-sol.py rule)."""
+    n = len(coordinates)
+    points = unit_sphere_points(coordinates)
+    tree = tree or cKDTree(points)
+    # Great-circle distance d corresponds to a chord of 2 * sin(d / 2R); pad slightly, then filter exactly
+    chord = 2 * np.sin(min(max_distance / (2 * EARTH_RADIUS_KM), np.pi / 2)) + 1e-12
+    pairs = tree.query_pairs(chord, output_type='ndarray')
+    tails = np.concatenate((pairs[:, 0], pairs[:, 1]))
+    heads = np.concatenate((pairs[:, 1], pairs[:, 0]))
+    arcs = _from_pairs(coordinates, n, tails, heads)
+    return filter_arcs(arcs, arcs.lengths <= max_distance)
+
+
+def filter_arcs(arcs, mask):
+    """Keeps only the arcs where mask is True."""
+    n = len(arcs.indptr) - 1
+    tails = arc_tails(arcs)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tails[mask], minlength=n), out=indptr[1:])
+    return CandidateArcs(indptr, arcs.heads[mask], arcs.lengths[mask])
+
+
+def union_arcs(coordinates, *arc_sets):
+    """Merges several arc sets over the same cities, dropping duplicate arcs."""
+    n = len(coordinates)
+    tails = np.concatenate([arc_tails(a) for a in arc_sets])
+    heads = np.concatenate([a.heads for a in arc_sets])
+    keys = np.unique(tails * n + heads)
+    return _from_pairs(coordinates, n, keys // n, keys % n)
+
+
+def build_candidate_arcs(coordinates, k=None, max_distance=None):
+    """Builds the candidate graph for top-k and/or within-radius pruning without an n x n matrix."""
+    tree = cKDTree(unit_sphere_points(coordinates))
+    arc_sets = []
+    if k is not None:
+        arc_sets.append(top_k_candidates(coordinates, k, tree=tree))
+    if max_distance is not None:
+        arc_sets.append(radius_candidates(coordinates, max_distance, tree=tree))
+    if not arc_sets:
+        raise ValueError('build_candidate_arcs needs k and/or max_distance')
+    if len(arc_sets) == 1:
+        return arc_sets[0]
+    return union_arcs(coordinates, *arc_sets)
+
+
+def arc_tails(arcs):
+    return np.repeat(np.arange(len(arcs.indptr) - 1), np.diff(arcs.indptr))
+
+
+def relabel_arcs(arcs, new_label):
+    """The same arcs with city i renamed new_label[i] (a permutation), rows re-sorted."""
+    n = len(arcs.indptr) - 1
+    tails, heads = new_label[arc_tails(arcs)], new_label[arcs.heads]
+    order = np.lexsort((heads, tails))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tails, minlength=n), out=indptr[1:])
+    return CandidateArcs(indptr, heads[order], arcs.lengths[order])
+
+
+def neighbors(arcs, i):
+    return arcs.heads[arcs.indptr[i]:arcs.indptr[i + 1]]
+
+
+def arc_lengths_dict(arcs):
+    """Returns {(i, j): length} for the PuLP model builders."""
+    return dict(zip(zip(arc_tails(arcs).tolist(), arcs.heads.tolist()), arcs.lengths.tolist()))
+
+
+def incoming_arcs(arcs):
+    """Returns {j: [i, ...]} listing the cities with a candidate arc into j."""
+    incoming = {j: [] for j in range(len(arcs.indptr) - 1)}
+    for i, j in zip(arc_tails(arcs).tolist(), arcs.heads.tolist()):
+        incoming[j].append(i)
+    return incoming
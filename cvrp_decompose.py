@@ -0,0 +1,141 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse.linalg import eigsh
+
+from cvrp_model import build_routing_model, default_search_parameters
+
+FLEET_SLACK = 1.1  # Capacity each cluster gets from the fleet assignment, relative to its demand
+
+
+def classical_mds(distance, dims=2):
+    """
+    Embeds the locations in the plane from the distance matrix alone (classical multidimensional
+    scaling), since the CVRP input has no coordinates. Returns an n x dims array.
+    """
+    d = np.asarray(distance, dtype=np.float64)
+    d = (d + d.T) / 2
+    sq = d * d
+    # Double centering of the squared distances: B = -1/2 J D^2 J
+    b = -0.5 * (sq - sq.mean(axis=0) - sq.mean(axis=1)[:, None] + sq.mean())
+    values, vectors = eigsh(b, k=dims, which='LA')
+    return vectors * np.sqrt(np.maximum(values, 0))
+
+
+def sweep_clusters(distance, weight, volume, depot, n_clusters):
+    """
+    Sorts the customers by polar angle around the depot and cuts the sweep into n_clusters
+    contiguous arcs of about equal load, where a customer's load is the larger of its share of the
+    total weight and of the total volume. Returns a list of node index arrays.
+    """
+    points = classical_mds(distance)
+    customers = np.setdiff1d(np.arange(len(points)), [depot])
+    offset = points[customers] - points[depot]
+    order = customers[np.argsort(np.arctan2(offset[:, 1], offset[:, 0]), kind='stable')]
+
+    weight, volume = np.asarray(weight, dtype=np.float64), np.asarray(volume, dtype=np.float64)
+    load = np.maximum(weight[order] / max(weight.sum(), 1), volume[order] / max(volume.sum(), 1))
+    # Cluster of each customer: which 1 / n_clusters slice of the cumulative load its midpoint falls in
+    midpoint = np.cumsum(load) - load / 2
+    label = np.minimum((midpoint / max(load.sum(), 1e-12) * n_clusters).astype(int), n_clusters - 1)
+    return [order[label == c] for c in range(n_clusters) if np.any(label == c)]
+
+
+def assign_fleet(clusters, weight, volume, max_weight, max_volume):
+    """
+    Splits the fleet over the clusters: vehicles are taken largest first and each goes to the
+    cluster with the largest uncovered fraction of its weight or volume demand (times FLEET_SLACK).
+    Every vehicle is assigned; unused ones cost nothing. Returns a list of vehicle index arrays.
+    """
+    weight, volume = np.asarray(weight, dtype=np.float64), np.asarray(volume, dtype=np.float64)
+    need_w = np.array([weight[c].sum() for c in clusters]) * FLEET_SLACK
+    need_v = np.array([volume[c].sum() for c in clusters]) * FLEET_SLACK
+    left_w, left_v = need_w.copy(), need_v.copy()
+    fleet = [[] for _ in clusters]
+    max_weight, max_volume = np.asarray(max_weight), np.asarray(max_volume)
+    for vehicle in np.lexsort((max_volume, max_weight))[::-1].tolist():
+        uncovered = np.maximum(left_w / np.maximum(need_w, 1), left_v / np.maximum(need_v, 1))
+        c = int(np.argmax(uncovered))
+        fleet[c].append(vehicle)
+        left_w[c] -= max_weight[vehicle]
+        left_v[c] -= max_volume[vehicle]
+    return [np.array(vehicles, dtype=np.int64) for vehicles in fleet]
+
+
+def subproblem(data, nodes, vehicles):
+    """The CVRP data of one cluster: the depot (local node 0) plus `nodes`, served by `vehicles`."""
+    local = np.concatenate(([data["depot"]], nodes))
+    distance = np.asarray(data["distance"])[np.ix_(local, local)]
+    return {
+        "distance": distance.tolist(),
+        "num_vehicles": len(vehicles),
+        "depot": 0,
+        "weight_matrix": [data["weight_matrix"][i] for i in local.tolist()],
+        "volume_matrix": [data["volume_matrix"][i] for i in local.tolist()],
+        "perKmCostPerVehicle": [data["perKmCostPerVehicle"][k] for k in vehicles.tolist()],
+        "fixedCostPerVehicle": [data["fixedCostPerVehicle"][k] for k in vehicles.tolist()],
+        "max_weight": [data["max_weight"][k] for k in vehicles.tolist()],
+        "max_volume": [data["max_volume"][k] for k in vehicles.tolist()],
+    }
+
+
+def solve_cluster(sub_data, time_limit):
+    """Process pool worker: solves one cluster's CVRP; returns the local node sequence of each vehicle, or None."""
+    manager, routing = build_routing_model(sub_data)
+    solution = routing.SolveWithParameters(default_search_parameters(time_limit=time_limit))
+    if not solution:
+        return None
+    routes = []
+    for vehicle_id in range(sub_data["num_vehicles"]):
+        route = []
+        index = solution.Value(routing.NextVar(routing.Start(vehicle_id)))
+        while not routing.IsEnd(index):
+            route.append(manager.IndexToNode(index))
+            index = solution.Value(routing.NextVar(index))
+        routes.append(route)
+    return routes
+
+
+def solve_decomposed(data, cluster_size=100, time_limit=1, reoptimize_seconds=0, workers=None):
+    """
+    Cluster-first route-second CVRP: sweep clusters of about cluster_size customers, a share of
+    the fleet per cluster, one sub-CVRP per cluster solved in a process pool (same dimensions and
+    costs as the full model), merged into one solution of the full model.
+
+    With reoptimize_seconds > 0, local search then runs on the full model from the merged
+    solution, which repairs routes across cluster boundaries.
+    Returns (manager, routing, solution) of the full model, as a direct solve would; solution is
+    None if a cluster could not be solved.
+    """
+    n_customers = len(data["distance"]) - 1
+    n_clusters = max(1, min(math.ceil(n_customers / cluster_size), data["num_vehicles"]))
+    clusters = sweep_clusters(data["distance"], data["weight_matrix"], data["volume_matrix"], data["depot"], n_clusters)
+    fleet = assign_fleet(clusters, data["weight_matrix"], data["volume_matrix"], data["max_weight"], data["max_volume"])
+
+    subproblems = [subproblem(data, nodes, vehicles) for nodes, vehicles in zip(clusters, fleet)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = list(pool.map(solve_cluster, subproblems, [time_limit] * len(subproblems)))
+    print(f"Decomposition: {len(clusters)} clusters, "
+          f"{sum(r is not None for r in results)} solved in {time_limit} s each")
+
+    manager, routing = build_routing_model(data)
+    if any(r is None for r in results):
+        return manager, routing, None
+
+    # Fleet assignment: each cluster's local vehicle k is global vehicle fleet[c][k]
+    routes = [[] for _ in range(data["num_vehicles"])]
+    for nodes, vehicles, local_routes in zip(clusters, fleet, results):
+        local_to_node = np.concatenate(([data["depot"]], nodes))
+        for k, route in zip(vehicles.tolist(), local_routes):
+            routes[k] = [manager.NodeToIndex(int(node)) for node in local_to_node[route]]
+    routing.CloseModelWithParameters(default_search_parameters())
+    solution = routing.ReadAssignmentFromRoutes(routes, True)
+    if solution and reoptimize_seconds > 0:
+        merged_objective = solution.ObjectiveValue()
+        solution = routing.SolveFromAssignmentWithParameters(
+            solution, default_search_parameters(time_limit=reoptimize_seconds)
+        ) or solution
+        print(f"Boundary re-optimization: {merged_objective} -> {solution.ObjectiveValue()}")
+    return manager, routing, solution
@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+FORMAT_VERSION = 1
+DISTANCE_DTYPE = np.int32  # The JSON loader truncates every distance to int; int32 holds up to ~2.1e9
+
+
+def aggregate_orders(order_location, order_weight, order_volume, n):
+    """
+    Total weight (in grams: kg * 1000) and volume per location, grouped with np.bincount.
+    Weights are summed before the conversion to int and volumes after it, as the JSON loader did.
+    Returns two int lists of length n.
+    """
+    order_location = np.asarray(order_location, dtype=np.int64)
+    weight = np.bincount(order_location, weights=np.asarray(order_weight, dtype=np.float64) * 1000, minlength=n)
+    volume = np.bincount(order_location, weights=np.trunc(np.asarray(order_volume, dtype=np.float64)), minlength=n)
+    return weight.astype(np.int64).tolist(), volume.astype(np.int64).tolist()
+
+
+def _instance(source, order_location, distance):
+    """The data dict of CVRP ASSIGNMENT.py from a JSON document (either format) and its order locations and distances."""
+    n = len(source["loc_ids"])
+    weight, volume = aggregate_orders(order_location, source["weight_matrix"], source["volume_matrix"], n)
+    data = {key: value for key, value in source.items() if key not in ("distance", "distance_file", "format_version")}
+    data.update(
+        weight_matrix=weight,
+        volume_matrix=volume,
+        location_matrix=list(range(n)),
+        depot=int(source["loc_ids"].index("loc0")) if "loc0" in source["loc_ids"] else 0,
+        distance=distance,
+    )
+    if "perKmCostPerVehicle" in data:
+        data["perKmCostPerVehicle"] = [int(value) for value in data["perKmCostPerVehicle"]]
+    return data
+
+
+def load_json_instance(file_path):
+    """
+    Loads today's JSON instance (loc_ids, one entry per order in location / weight / volume_matrix,
+    dense distance list). Distances are truncated to int as an integer array.
+    """
+    with open(file_path, 'r') as file:
+        source = json.load(file)
+    loc_id_to_index = {loc_id: index for index, loc_id in enumerate(source["loc_ids"])}
+    order_location = [loc_id_to_index[loc] for loc in source["location_matrix"]]
+    distance = np.array(source["distance"], dtype=np.float64).astype(np.int64)
+    return _instance(source, order_location, distance)
+
+
+def load_binary_instance(header_path):
+    """
+    Loads the binary format written by convert_instance: a JSON header with the order and fleet
+    data, whose location_matrix already holds location indices, plus the distance matrix as a
+    .npy file (distance_file, relative to the header) opened as a read-only memory map, so only
+    the rows the solver touches are read from disk.
+    """
+    with open(header_path, 'r') as file:
+        header = json.load(file)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f'{header_path}: unsupported CVRP instance format {header.get("format_version")!r}')
+    distance_path = os.path.join(os.path.dirname(os.path.abspath(header_path)), header["distance_file"])
+    distance = np.load(distance_path, mmap_mode='r')
+    n = len(header["loc_ids"])
+    if distance.shape != (n, n):
+        raise ValueError(f'{distance_path}: distance matrix is {distance.shape}, expected {(n, n)}')
+    return _instance(header, header["location_matrix"], distance)
+
+
+def load_instance(file_path):
+    """Loads either format: a JSON header with a distance_file is the binary format, anything else today's JSON."""
+    with open(file_path, 'rb') as file:
+        head = file.read(4096)
+    if b'"format_version"' in head:
+        return load_binary_instance(file_path)
+    return load_json_instance(file_path)
+
+
+def convert_instance(json_path, header_path=None):
+    """
+    Converts today's JSON instance to the binary format: <name>.header.json next to
+    <name>.distance.npy (int32, truncated as the JSON loader does). Returns the header path.
+    The header is written last, so a half-converted instance is never picked up.
+    """
+    with open(json_path, 'r') as file:
+        source = json.load(file)
+    if header_path is None:
+        header_path = os.path.splitext(json_path)[0] + '.header.json'
+    distance_path = os.path.splitext(header_path)[0].removesuffix('.header') + '.distance.npy'
+
+    distance = np.array(source.pop("distance"), dtype=np.float64).astype(np.int64)
+    if distance.size and (distance.max() > np.iinfo(DISTANCE_DTYPE).max or distance.min() < np.iinfo(DISTANCE_DTYPE).min):
+        raise ValueError(f'{json_path}: distances do not fit in {np.dtype(DISTANCE_DTYPE).name}')
+    np.save(distance_path, distance.astype(DISTANCE_DTYPE))
+
+    loc_id_to_index = {loc_id: index for index, loc_id in enumerate(source["loc_ids"])}
+    source["location_matrix"] = [loc_id_to_index[loc] for loc in source["location_matrix"]]
+    header = {"format_version": FORMAT_VERSION, "distance_file": os.path.basename(distance_path), **source}
+    with open(header_path, 'w') as file:
+        json.dump(header, file)
+    return header_path
+
+
+if __name__ == '__main__':
+    # python cvrp_instance.py assignment_cvrp.json [assignment_cvrp.header.json]
+    print(f'Binary instance written to {convert_instance(*sys.argv[1:3])}')
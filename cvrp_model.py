@@ -0,0 +1,145 @@
+import math
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from ortools.constraint_solver import routing_enums_pb2
+from ortools.constraint_solver import pywrapcp
+
+
+def vehicle_cost_classes(per_km_cost):
+    """Groups vehicles by per-km cost; returns (cost of each class, class index of each vehicle)."""
+    class_costs, vehicle_class = np.unique(np.asarray(per_km_cost, dtype=np.int64), return_inverse=True)
+    return class_costs, vehicle_class
+
+
+def cost_matrices(distance, class_costs):
+    """Integer arc cost matrices, one per cost class: per-km cost * ceil(distance), as vehicle_cost_callback computed it."""
+    km = np.ceil(np.asarray(distance, dtype=np.float64)).astype(np.int64)
+    return [km * int(cost) for cost in class_costs]
+
+
+def _register_callbacks(data, manager, routing):
+    """The original Python callbacks: one cost callback per vehicle, called from C++ for every arc evaluated."""
+    def vehicle_cost_callback(vehicle_id, from_index, to_index):
+        from_node = manager.IndexToNode(from_index)
+        to_node = manager.IndexToNode(to_index)
+        distance = math.ceil(data["distance"][from_node][to_node])
+        return int(data["perKmCostPerVehicle"][vehicle_id] * distance)
+
+    for vehicle_id in range(data["num_vehicles"]):
+        vehicle_cost_callback_index = routing.RegisterTransitCallback(
+            lambda from_index, to_index, vehicle_id=vehicle_id:
+            vehicle_cost_callback(vehicle_id, from_index, to_index)
+        )
+        routing.SetArcCostEvaluatorOfVehicle(vehicle_cost_callback_index, vehicle_id)
+
+    def weight_callback(from_index):
+        return data["weight_matrix"][manager.IndexToNode(from_index)]
+
+    def volume_callback(from_index):
+        return data["volume_matrix"][manager.IndexToNode(from_index)]
+
+    return routing.RegisterUnaryTransitCallback(weight_callback), routing.RegisterUnaryTransitCallback(volume_callback)
+
+
+def _register_matrices(data, routing):
+    """Precomputed costs: one transit matrix per cost class and the demands as vectors, so no Python runs during search."""
+    class_costs, vehicle_class = vehicle_cost_classes(data["perKmCostPerVehicle"])
+    class_index = [routing.RegisterTransitMatrix(matrix.tolist()) for matrix in cost_matrices(data["distance"], class_costs)]
+    for vehicle_id in range(data["num_vehicles"]):
+        routing.SetArcCostEvaluatorOfVehicle(class_index[vehicle_class[vehicle_id]], vehicle_id)
+    return (
+        routing.RegisterUnaryTransitVector([int(w) for w in data["weight_matrix"]]),
+        routing.RegisterUnaryTransitVector([int(v) for v in data["volume_matrix"]]),
+    )
+
+
+def build_routing_model(data, arc_costs='matrix'):
+    """
+    Builds the CVRP of CVRP ASSIGNMENT.py: per-vehicle arc costs, fixed vehicle costs and
+    weight / volume capacities. Returns (manager, routing).
+
+    arc_costs='matrix' registers precomputed integer matrices per cost class (vehicles with the
+    same perKmCostPerVehicle share one) and the demands as vectors. 'callback' registers the
+    original Python callbacks, kept for comparison.
+    """
+    manager = pywrapcp.RoutingIndexManager(len(data["distance"]), data["num_vehicles"], data["depot"])
+    routing = pywrapcp.RoutingModel(manager)
+
+    if arc_costs == 'callback':
+        weight_index, volume_index = _register_callbacks(data, manager, routing)
+    else:
+        weight_index, volume_index = _register_matrices(data, routing)
+
+    for vehicle_id in range(data["num_vehicles"]):
+        routing.SetFixedCostOfVehicle(math.ceil(data["fixedCostPerVehicle"][vehicle_id]), vehicle_id)
+
+    # Capacity constraints: null slack, per-vehicle maximum, cumul starts at zero
+    routing.AddDimensionWithVehicleCapacity(weight_index, 0, data["max_weight"], True, "Weight_Capacity")
+    routing.AddDimensionWithVehicleCapacity(volume_index, 0, data["max_volume"], True, "Volume_Capacity")
+    return manager, routing
+
+
+def default_search_parameters(time_limit=1):
+    """PATH_CHEAPEST_ARC first solution improved by simulated annealing for time_limit seconds."""
+    parameters = pywrapcp.DefaultRoutingSearchParameters()
+    parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.SIMULATED_ANNEALING
+    parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+    parameters.log_search = False
+    return parameters
+
+
+def search_stats(routing):
+    """Search effort of the last solve: branches, failures and accepted local search moves, in total and per second."""
+    solver = routing.solver()
+    seconds = solver.WallTime() / 1000
+    stats = {
+        'wall_seconds': seconds,
+        'branches': solver.Branches(),
+        'failures': solver.Failures(),
+        'accepted_neighbors': solver.AcceptedNeighbors(),
+    }
+    for key in ('branches', 'failures', 'accepted_neighbors'):
+        stats[key + '_per_second'] = stats[key] / seconds if seconds else None
+    return stats
+
+
+def current_solution(routing):
+    """Inside an AtSolutionCallback: the solution being reported, with the Value / ObjectiveValue of an Assignment."""
+    return SimpleNamespace(Value=lambda var: var.Value(), ObjectiveValue=lambda: routing.CostVar().Value())
+
+
+def solve_anytime(routing, search_parameters, on_improvement, no_improvement_seconds=None, initial_solution=None):
+    """
+    Solves with search_parameters (its time limit is the wall-clock budget) and calls
+    on_improvement(solution, objective, elapsed_seconds) for every solution better than the
+    previous best, while the search is still running.
+
+    With no_improvement_seconds the search is cancelled once that long has passed without an
+    improvement. The check runs whenever the search reports a solution, which the metaheuristics
+    do many times per second. With initial_solution (an assignment of the closed model) the
+    local search starts from it instead of a first solution heuristic.
+    Returns (final solution or None, [(elapsed_seconds, objective), ...]).
+    """
+    start = time.perf_counter()
+    improvements = []
+    last_improvement = [start]
+
+    def on_solution():
+        now = time.perf_counter()
+        objective = routing.CostVar().Value()
+        if not improvements or objective < improvements[-1][1]:
+            improvements.append((now - start, objective))
+            last_improvement[0] = now
+            on_improvement(current_solution(routing), objective, now - start)
+        elif no_improvement_seconds is not None and now - last_improvement[0] > no_improvement_seconds:
+            routing.CancelSearch()
+
+    routing.AddAtSolutionCallback(on_solution)
+    if initial_solution is not None:
+        solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+    else:
+        solution = routing.SolveWithParameters(search_parameters)
+    return solution, improvements
@@ -0,0 +1,156 @@
+import json
+import math
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+
+def extract_routes(data, manager, routing, solution):
+    """
+    Walks every vehicle route once and returns them as columns: node, cumulative weight and
+    volume per stop (all routes concatenated, route v is stops start[v]:start[v + 1], depot at
+    both ends), and cost, weight and volume per route. Arc costs are computed from the node
+    columns with the integer costs of build_routing_model (per-km cost * ceil(distance), plus the
+    fixed cost of a used vehicle) instead of one GetArcCostForVehicle call per hop.
+    """
+    nodes, lengths = [], []
+    for vehicle_id in range(data["num_vehicles"]):
+        index = routing.Start(vehicle_id)
+        route = [manager.IndexToNode(index)]
+        while not routing.IsEnd(index):
+            index = solution.Value(routing.NextVar(index))
+            route.append(manager.IndexToNode(index))
+        nodes.extend(route)
+        lengths.append(len(route))
+    node = np.array(nodes, dtype=np.int64)
+    start = np.concatenate(([0], np.cumsum(lengths)))
+    first, last = start[:-1], start[1:] - 1
+    vehicle = np.repeat(np.arange(data["num_vehicles"]), lengths)
+
+    # Demand picked up at each stop; the closing depot stop repeats the cumulative load
+    is_end = np.zeros(len(node), dtype=bool)
+    is_end[last] = True
+    cumulative = {}
+    for key in ("weight_matrix", "volume_matrix"):
+        demand = np.where(is_end, 0, np.asarray(data[key], dtype=np.int64)[node])
+        total = np.cumsum(demand)
+        cumulative[key] = total - np.repeat(total[first] - demand[first], lengths)
+
+    # Arc costs: arcs run between consecutive stops of the same route
+    tails, heads = node[:-1][~is_end[:-1]], node[1:][~is_end[:-1]]
+    arc_vehicle = vehicle[:-1][~is_end[:-1]]
+    km = np.ceil(np.asarray(data["distance"])[tails, heads].astype(np.float64)).astype(np.int64)
+    arc_cost = km * np.asarray(data["perKmCostPerVehicle"], dtype=np.int64)[arc_vehicle]
+    used = np.asarray(lengths) > 2
+    fixed = np.array([math.ceil(cost) for cost in data["fixedCostPerVehicle"]], dtype=np.int64)
+    route_cost = np.bincount(arc_vehicle, weights=arc_cost, minlength=data["num_vehicles"]).astype(np.int64)
+    route_cost += np.where(used, fixed, 0)
+
+    return SimpleNamespace(
+        objective=solution.ObjectiveValue(),
+        start=start,
+        node=node,
+        cumulative_weight=cumulative["weight_matrix"],
+        cumulative_volume=cumulative["volume_matrix"],
+        route_cost=route_cost,
+        route_weight=cumulative["weight_matrix"][last],
+        route_volume=cumulative["volume_matrix"][last],
+        loc_ids=data.get("loc_ids"),
+    )
+
+
+def route_summary(routes):
+    """The console report of print_solution, built from extract_routes columns."""
+    lines = [f"Objective: {routes.objective}"]
+    node, weight, volume = routes.node.tolist(), routes.cumulative_weight.tolist(), routes.cumulative_volume.tolist()
+    for vehicle_id in range(len(routes.route_cost)):
+        a, b = routes.start[vehicle_id], routes.start[vehicle_id + 1]
+        hops = "".join(f" {node[s]} Volume({volume[s]}) Weight({weight[s]}) -> " for s in range(a, b - 1))
+        lines.append(
+            f"Route for vehicle {vehicle_id}:\n{hops} {node[b - 1]} Volume({volume[b - 1]}) Weight({weight[b - 1]})\n"
+            f"Cost of the route: {routes.route_cost[vehicle_id]}\n"
+            f"Volume of the route: {routes.route_volume[vehicle_id]}\n"
+            f"Weight of the route: {routes.route_weight[vehicle_id]}\n"
+        )
+    lines.append(f"Total cost of all routes: {int(routes.route_cost.sum())}")
+    lines.append(f"Total volume of all routes: {int(routes.route_volume.sum())}")
+    lines.append(f"Total weight of all routes: {int(routes.route_weight.sum())}")
+    return "\n".join(lines)
+
+
+def route_records(routes):
+    """Yields one route dict per vehicle, in the layout of cvrp_solution.json."""
+    node, weight, volume = routes.node.tolist(), routes.cumulative_weight.tolist(), routes.cumulative_volume.tolist()
+    for vehicle_id in range(len(routes.route_cost)):
+        stops = []
+        for s in range(routes.start[vehicle_id], routes.start[vehicle_id + 1]):
+            stop = {"location": node[s]}
+            if routes.loc_ids is not None:
+                stop["loc_id"] = routes.loc_ids[node[s]]
+            stop.update(cumulative_volume=volume[s], cumulative_weight=weight[s])
+            stops.append(stop)
+        yield {
+            "vehicle_id": vehicle_id,
+            "route": stops,
+            "route_cost": int(routes.route_cost[vehicle_id]),
+            "route_volume": int(routes.route_volume[vehicle_id]),
+            "route_weight": int(routes.route_weight[vehicle_id]),
+        }
+
+
+def totals(routes):
+    return {
+        "total_cost": int(routes.route_cost.sum()),
+        "total_volume": int(routes.route_volume.sum()),
+        "total_weight": int(routes.route_weight.sum()),
+    }
+
+
+def routes_to_dict(routes, **extra):
+    """The whole cvrp_solution.json document as one dict (extra keys such as a timestamp go last)."""
+    return {"objective": routes.objective, "routes": list(route_records(routes)), **totals(routes), **extra}
+
+
+def write_routes_json(routes, path, style='indent', **extra):
+    """
+    Writes the solution route by route, never holding the whole document in memory, to a
+    temporary file renamed over `path` (readers never see a partial file).
+
+    style='indent' gives the layout of json.dump(indent=4), 'compact' the same document without
+    whitespace, and 'ndjson' one JSON object per line: first the objective, totals and extra
+    keys, then one line per route.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    header = {"objective": routes.objective, **totals(routes), **extra}
+    with open(tmp_path, 'w') as out:
+        if style == 'ndjson':
+            out.write(json.dumps(header, separators=(',', ':')) + '\n')
+            for record in route_records(routes):
+                out.write(json.dumps(record, separators=(',', ':')) + '\n')
+        elif style == 'compact':
+            out.write(f'{{"objective":{json.dumps(routes.objective)},"routes":[')
+            for i, record in enumerate(route_records(routes)):
+                out.write((',' if i else '') + json.dumps(record, separators=(',', ':')))
+            out.write(']' + json.dumps(header, separators=(',', ':'))[len(f'{{"objective":{json.dumps(routes.objective)}'):])
+        else:
+            out.write(f'{{\n    "objective": {json.dumps(routes.objective)},\n    "routes": [')
+            for i, record in enumerate(route_records(routes)):
+                body = json.dumps(record, indent=4).replace('\n', '\n        ')
+                out.write((',' if i else '') + '\n        ' + body)
+            rest = json.dumps(header, indent=4)[len(f'{{\n    "objective": {json.dumps(routes.objective)}'):]
+            out.write('\n    ]' + rest)
+    os.replace(tmp_path, path)
+
+
+def read_routes_json(path):
+    """Reads a solution written by write_routes_json in any style back into the dict of routes_to_dict."""
+    with open(path, 'r') as file:
+        text = file.read()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # NDJSON: a header line, then one route per line
+        lines = [json.loads(line) for line in text.splitlines() if line.strip()]
+        header = lines[0]
+        return {"objective": header.pop("objective"), "routes": lines[1:], **header}
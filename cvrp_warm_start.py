@@ -0,0 +1,148 @@
+import math
+
+import numpy as np
+
+from cvrp_model import default_search_parameters
+
+
+def previous_routes(previous, data):
+    """
+    Maps the routes of a previous cvrp_solution.json (the loaded JSON) to node lists of the
+    current instance, one per vehicle (depot left out). Stops are matched by loc_id where the
+    file has one, otherwise by location index. Returns (routes, dropped loc ids): stops whose location no longer exists
+    are dropped, and routes of vehicles beyond the current fleet are emptied (their stops are
+    missing from the routes, so they get reinserted).
+    """
+    loc_ids = data["loc_ids"]
+    index_of = {loc_id: index for index, loc_id in enumerate(loc_ids)}
+    routes = [[] for _ in range(data["num_vehicles"])]
+    dropped = []
+    for route in previous.get("routes", []):
+        vehicle_id = route["vehicle_id"]
+        for stop in route["route"]:
+            loc_id = stop.get("loc_id")
+            if loc_id is None:
+                node = stop["location"] if stop["location"] < len(loc_ids) else None
+            else:
+                node = index_of.get(loc_id)
+            if node is None:
+                dropped.append(loc_id if loc_id is not None else stop["location"])
+            elif node != data["depot"] and vehicle_id < len(routes):
+                routes[vehicle_id].append(node)
+    return routes, dropped
+
+
+def _arc_cost(data, vehicle_id, tails, heads):
+    # Same integer arc cost as the routing model: per-km cost * ceil(distance)
+    distance = np.ceil(np.asarray(data["distance"])[tails, heads].astype(np.float64))
+    return distance * data["perKmCostPerVehicle"][vehicle_id]
+
+
+def repair_routes(data, routes):
+    """
+    Makes previous routes fit today's demands: drops stops visited twice and, while a route is
+    over its weight or volume capacity, moves its last stops out. Returns (routes, removed nodes).
+    """
+    weight, volume = np.asarray(data["weight_matrix"]), np.asarray(data["volume_matrix"])
+    seen, removed, repaired = set(), [], []
+    for vehicle_id, route in enumerate(routes):
+        route = [node for node in route if not (node in seen or seen.add(node))]
+        while route and (weight[route].sum() > data["max_weight"][vehicle_id]
+                         or volume[route].sum() > data["max_volume"][vehicle_id]):
+            removed.append(route.pop())
+        repaired.append(route)
+    return repaired, removed
+
+
+def cheapest_insertion(data, routes, nodes):
+    """
+    Inserts each node (largest weight first) at the position and vehicle of least added cost
+    that keeps the route within its weight and volume capacity; an empty vehicle also adds its
+    fixed cost. Positions are scored with NumPy per route. Returns (routes, nodes that fit nowhere).
+    """
+    depot = data["depot"]
+    weight, volume = np.asarray(data["weight_matrix"]), np.asarray(data["volume_matrix"])
+    load_w = [int(weight[route].sum()) for route in routes]
+    load_v = [int(volume[route].sum()) for route in routes]
+    unplaced = []
+    for node in sorted(nodes, key=lambda u: -weight[u]):
+        best = None
+        for vehicle_id, route in enumerate(routes):
+            if (load_w[vehicle_id] + weight[node] > data["max_weight"][vehicle_id]
+                    or load_v[vehicle_id] + volume[node] > data["max_volume"][vehicle_id]):
+                continue
+            stops = np.array([depot] + route + [depot])
+            tails, heads = stops[:-1], stops[1:]
+            added = (_arc_cost(data, vehicle_id, tails, node) + _arc_cost(data, vehicle_id, node, heads)
+                     - _arc_cost(data, vehicle_id, tails, heads))
+            position = int(np.argmin(added))
+            cost = added[position] + (0 if route else math.ceil(data["fixedCostPerVehicle"][vehicle_id]))
+            if best is None or cost < best[0]:
+                best = (cost, vehicle_id, position)
+        if best is None:
+            unplaced.append(node)
+            continue
+        _, vehicle_id, position = best
+        routes[vehicle_id].insert(position, node)
+        load_w[vehicle_id] += int(weight[node])
+        load_v[vehicle_id] += int(volume[node])
+    return routes, unplaced
+
+
+def warm_start_routes(previous, data):
+    """
+    Today's initial routes from yesterday's solution: previous routes mapped to today's
+    locations, repaired for today's demands, with new and displaced locations added by cheapest
+    insertion. Returns (routes, report) where report counts the dropped, inserted and unplaced
+    locations.
+    """
+    routes, dropped = previous_routes(previous, data)
+    routes, removed = repair_routes(data, routes)
+    planned = {node for route in routes for node in route}
+    new = [node for node in range(len(data["distance"])) if node != data["depot"] and node not in planned]
+    routes, unplaced = cheapest_insertion(data, routes, new)
+    report = {
+        'dropped_locations': len(dropped),
+        'removed_for_capacity': len(removed),
+        'inserted': len(new) - len(unplaced),
+        'unplaced': len(unplaced),
+    }
+    return routes, report
+
+
+def initial_assignment(routing, manager, routes):
+    """Closes the model and reads the node routes as an assignment; None if they violate a constraint."""
+    routing.CloseModelWithParameters(default_search_parameters())
+    return routing.ReadAssignmentFromRoutes([[manager.NodeToIndex(node) for node in route] for route in routes], True)
+
+
+def plan_changes(previous, solution_json, data):
+    """
+    Compares today's solution with yesterday's, matched by loc_id (or index): stops kept on the
+    same vehicle, moved to another vehicle, new and dropped; the share of yesterday's arcs still
+    driven; and the objective of both plans.
+    """
+    def stops(solution, loc_ids=None):
+        vehicle_of, arcs = {}, set()
+        for route in solution["routes"]:
+            keys = [stop.get("loc_id", stop["location"]) for stop in route["route"]]
+            if loc_ids is not None:
+                keys = [loc_ids[key] if isinstance(key, int) and key < len(loc_ids) else key for key in keys]
+            for key in keys[1:-1]:
+                vehicle_of[key] = route["vehicle_id"]
+            arcs.update((a, b) for a, b in zip(keys, keys[1:]) if a != b)
+        return vehicle_of, arcs
+
+    before, before_arcs = stops(previous, data["loc_ids"])
+    after, after_arcs = stops(solution_json)
+    common = before.keys() & after.keys()
+    same_vehicle = sum(before[key] == after[key] for key in common)
+    return {
+        'previous_objective': previous.get("objective"),
+        'objective': solution_json["objective"],
+        'stops_same_vehicle': same_vehicle,
+        'stops_moved': len(common) - same_vehicle,
+        'stops_new': len(after.keys() - before.keys()),
+        'stops_dropped': len(before.keys() - after.keys()),
+        'arcs_kept_share': len(before_arcs & after_arcs) / len(before_arcs) if before_arcs else None,
+    }
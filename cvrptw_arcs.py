@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def allowed_trucks(allowed_mask, truck_type):
+    """
+    Returns a (K, n) bool array: truck k may visit location i. allowed_mask holds the bitmask of
+    allowed truck type codes per location and truck_type the type code of each truck (cvrptw_data).
+    """
+    allowed_mask = np.asarray(allowed_mask, dtype=np.int64)
+    truck_type = np.asarray(truck_type, dtype=np.int64)
+    return ((allowed_mask[None, :] >> truck_type[:, None]) & 1).astype(bool)
+
+
+def service_times(n, depot, service_time_customer=20, service_time_depot=60):
+    """n x n service time charged on arc i -> j: customer service between two customers, depot service otherwise."""
+    customer = np.arange(n) != depot
+    return np.where(customer[:, None] & customer[None, :], service_time_customer, service_time_depot)
+
+
+def arc_big_m(travel_time, start_minutes, end_minutes, depot, service_time_customer=20, service_time_depot=60):
+    """
+    Smallest big-M per arc that still switches Service_Time off when x[i, j] = 0. The row
+    t_j - t_i >= service + travel - M must hold for every t_i <= end_i and t_j >= start_j, so
+    M_ij = end_i + service_ij + travel_ij - start_j. Where M_ij <= 0 the row holds for any times
+    within the windows and can be left out.
+    """
+    travel_time = np.asarray(travel_time, dtype=np.float64)
+    start_minutes = np.asarray(start_minutes, dtype=np.float64)
+    end_minutes = np.asarray(end_minutes, dtype=np.float64)
+    service = service_times(len(travel_time), depot, service_time_customer, service_time_depot)
+    return end_minutes[:, None] + service + travel_time - start_minutes[None, :]
+
+
+def feasible_arc_mask(travel_time, start_minutes, end_minutes, allowed, depot,
+                      service_time_customer=20, service_time_depot=60):
+    """
+    Returns a (K, n, n) bool array of the arcs x[k, i, j] worth creating, and the counts of arcs
+    removed by each rule. An arc is kept if i != j, truck k is allowed at both i and j, and
+    leaving i at its window start, plus service and travel time, reaches j before its window closes.
+    Arcs back into the depot are not time checked; the models put no Service_Time row on them.
+    """
+    travel_time = np.asarray(travel_time, dtype=np.float64)
+    start_minutes = np.asarray(start_minutes, dtype=np.float64)
+    end_minutes = np.asarray(end_minutes, dtype=np.float64)
+    n = len(travel_time)
+
+    not_loop = ~np.eye(n, dtype=bool)
+    truck_ok = allowed[:, :, None] & allowed[:, None, :]
+
+    service = service_times(n, depot, service_time_customer, service_time_depot)
+    time_ok = start_minutes[:, None] + service + travel_time <= end_minutes[None, :]
+    time_ok[:, depot] = True
+
+    mask = truck_ok & (not_loop & time_ok)[None, :, :]
+    removed = {
+        'self_loops': len(allowed) * n,
+        'truck_type': int((~truck_ok & not_loop[None]).sum()),
+        'time_window': int((truck_ok & (not_loop & ~time_ok)[None]).sum()),
+    }
+    return mask, removed
+
+
+def report_arc_reduction(mask, removed):
+    """Prints how many x variables the arc filter removed, by rule; returns the same numbers as a dict."""
+    total = mask.size
+    kept = int(mask.sum())
+    print(f"Arc filter: {kept} of {total} x variables kept ({total - kept} removed: "
+          f"{removed['self_loops']} self-loops, {removed['truck_type']} truck type, "
+          f"{removed['time_window']} time window)")
+    return {'x_total': total, 'x_kept': kept, **removed}
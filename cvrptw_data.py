@@ -0,0 +1,104 @@
+import ast
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+
+def window_minutes(times):
+    """Parses 'HH:MM' strings once into minutes after midnight (int array)."""
+    parsed = pd.to_datetime(pd.Series(times), format='%H:%M')
+    return (parsed.dt.hour * 60 + parsed.dt.minute).to_numpy(dtype=np.int64)
+
+
+def parse_truck_types(value):
+    """
+    Parses one trucks_allowed cell, a Python list literal such as "['small', 'big']", without eval:
+    ast.literal_eval only accepts literals. Raises ValueError on anything but a list of strings.
+    """
+    types = ast.literal_eval(value)
+    if not isinstance(types, (list, tuple)) or not all(isinstance(t, str) for t in types):
+        raise ValueError(f'trucks_allowed must be a list of truck types, got {value!r}')
+    return types
+
+
+def allowed_bitmasks(trucks_allowed, type_codes):
+    """
+    One integer per location with bit c set when truck type c (its code in type_codes) may visit
+    it. Types not in the fleet are ignored.
+    """
+    masks = np.zeros(len(trucks_allowed), dtype=np.int64)
+    for pos, value in enumerate(trucks_allowed):
+        for truck_type in parse_truck_types(value):
+            if truck_type in type_codes:
+                masks[pos] |= 1 << type_codes[truck_type]
+    return masks
+
+
+def truck_classes(truck_type, truck_weight):
+    """Class index per truck: trucks with the same type and capacity are interchangeable and share a class."""
+    pairs = np.column_stack((np.asarray(truck_type, dtype=np.int64), np.asarray(truck_weight, dtype=np.int64)))
+    return np.unique(pairs, axis=0, return_inverse=True)[1].reshape(-1)
+
+
+def travel_arrays(travel_matrix_df, index):
+    """Distance and travel time matrices over the location index; pairs missing from the travel matrix are 0."""
+    n = len(index)
+    src = travel_matrix_df['source_location_code'].astype(str).map(index)
+    dst = travel_matrix_df['destination_location_code'].astype(str).map(index)
+    known = src.notna() & dst.notna()
+    src, dst = src[known].astype(int), dst[known].astype(int)
+    distance = np.zeros((n, n))
+    travel_time = np.zeros((n, n))
+    distance[src, dst] = travel_matrix_df.loc[known, 'travel_distance_in_km']
+    travel_time[src, dst] = travel_matrix_df.loc[known, 'travel_time_in_min']
+    return distance, travel_time
+
+
+def prepare_cvrptw_data(locations_df, order_list_df, travel_matrix_df, trucks_df, depot):
+    """
+    Parses the CVRPTW inputs once into arrays over location and truck indices, so the model
+    builders never look anything up in a DataFrame. Location i is row i of locations_df and
+    truck k row k of trucks_df. Returns a SimpleNamespace with:
+
+    locations, index          location codes and {code: index}
+    depot                     index of the depot
+    start_minutes, end_minutes  loading / unloading window per location
+    allowed_mask              bitmask of truck type codes allowed per location
+    truck_types, truck_type   type names, and the type code of each truck
+    truck_class               class of each truck: same type and capacity (truck_classes)
+    truck_ids, truck_weight   id and capacity of each truck
+    distance, travel_time     n x n matrices
+    order_invoice, order_location, location_weight
+                              invoice and location index of each order, total order weight per location
+    """
+    locations = locations_df['location_code'].astype(str).tolist()
+    index = {code: pos for pos, code in enumerate(locations)}
+
+    truck_types = list(dict.fromkeys(trucks_df['truck_type'].tolist()))
+    type_codes = {truck_type: code for code, truck_type in enumerate(truck_types)}
+    truck_type = trucks_df['truck_type'].map(type_codes).to_numpy(dtype=np.int64)
+    truck_weight = trucks_df['truck_max_weight'].astype(int).to_numpy()
+    distance, travel_time = travel_arrays(travel_matrix_df, index)
+
+    order_codes = order_list_df['Destination Code'].astype(str)
+    location_weight = order_list_df.groupby(order_codes)['Total Weight'].sum()
+
+    return SimpleNamespace(
+        locations=locations,
+        index=index,
+        depot=index[depot],
+        start_minutes=window_minutes(locations_df['location_loading_unloading_window_start']),
+        end_minutes=window_minutes(locations_df['location_loading_unloading_window_end']),
+        allowed_mask=allowed_bitmasks(locations_df['trucks_allowed'], type_codes),
+        truck_types=truck_types,
+        truck_type=truck_type,
+        truck_class=truck_classes(truck_type, truck_weight),
+        truck_ids=trucks_df['truck_id'].tolist(),
+        truck_weight=truck_weight,
+        distance=distance,
+        travel_time=travel_time,
+        order_invoice=order_list_df['Invoice No.'].tolist(),
+        order_location=np.array([index[code] for code in order_codes], dtype=np.int64),
+        location_weight=location_weight.reindex(locations, fill_value=0).to_numpy(dtype=float),
+    )
@@ -0,0 +1,137 @@
+import math
+
+import numpy as np
+from ortools.constraint_solver import routing_enums_pb2
+from ortools.constraint_solver import pywrapcp
+
+from cvrp_model import vehicle_cost_classes
+from cvrptw_arcs import allowed_trucks, service_times
+
+
+def build_cvrptw_routing(data, service_time_customer=20, service_time_depot=60, use_all_trucks=True):
+    """
+    Builds the CVRPTW of CVRPTW (1).py as a routing model over the arrays of cvrptw_data. Returns
+    (manager, routing).
+
+    Arc costs are the MILP's distance * (20000 - capacity / 1000), one matrix per capacity, plus a
+    fixed cost of 2 * capacity per truck. Time is a dimension whose transit on i -> j is service
+    plus travel time (rounded up, so the routes stay feasible for the MILP), with waiting allowed
+    and the location windows on the cumuls. Weight is a capacity dimension, and each customer only
+    allows the trucks whose type may visit it. With use_all_trucks an empty truck is penalized
+    above any route cost, since Leave_Depot == 1 in the MILP makes every truck serve a customer.
+    Locations without orders may be skipped.
+    """
+    n, n_trucks, depot = len(data.locations), len(data.truck_weight), data.depot
+    manager = pywrapcp.RoutingIndexManager(n, n_trucks, depot)
+    routing = pywrapcp.RoutingModel(manager)
+
+    # Arc costs: one integer matrix per truck capacity
+    class_weights, truck_class = vehicle_cost_classes(data.truck_weight)
+    class_index = [
+        routing.RegisterTransitMatrix(np.rint(data.distance * (20000 - weight / 1000)).astype(np.int64).tolist())
+        for weight in class_weights.tolist()
+    ]
+    for k in range(n_trucks):
+        routing.SetArcCostEvaluatorOfVehicle(class_index[truck_class[k]], k)
+        routing.SetFixedCostOfVehicle(int(data.truck_weight[k]) * 2, k)
+
+    # Time: service + travel per arc, waiting allowed up to the end of the horizon
+    transit = np.ceil(service_times(n, depot, service_time_customer, service_time_depot) + data.travel_time)
+    np.fill_diagonal(transit, 0)
+    horizon = int(data.end_minutes.max() + transit.max())
+    time_index = routing.RegisterTransitMatrix(transit.astype(np.int64).tolist())
+    routing.AddDimension(time_index, horizon, horizon, False, "Time")
+    time_dimension = routing.GetDimensionOrDie("Time")
+    for i in range(n):
+        if i != depot:
+            time_dimension.CumulVar(manager.NodeToIndex(i)).SetRange(int(data.start_minutes[i]), int(data.end_minutes[i]))
+    for k in range(n_trucks):
+        time_dimension.CumulVar(routing.Start(k)).SetRange(int(data.start_minutes[depot]), int(data.end_minutes[depot]))
+
+    # Weight capacity
+    weight_index = routing.RegisterUnaryTransitVector([math.ceil(w) for w in data.location_weight.tolist()])
+    routing.AddDimensionWithVehicleCapacity(weight_index, 0, [int(w) for w in data.truck_weight], True, "Weight_Capacity")
+
+    # Truck types per location; locations without orders are optional
+    allowed = allowed_trucks(data.allowed_mask, data.truck_type)
+    for i in range(n):
+        if i == depot:
+            continue
+        index = manager.NodeToIndex(i)
+        routing.VehicleVar(index).RemoveValues(np.flatnonzero(~allowed[:, i]).tolist())
+        if data.location_weight[i] <= 0:
+            routing.AddDisjunction([index], 0)
+
+    if use_all_trucks:
+        # Soft, so first solutions can leave trucks empty; the penalty outweighs any route cost
+        stops_index = routing.RegisterUnaryTransitVector([int(i != depot) for i in range(n)])
+        routing.AddDimension(stops_index, 0, n, True, "Stops")
+        stops = routing.GetDimensionOrDie("Stops")
+        penalty = int(data.distance.max() * 20000 * n)
+        for k in range(n_trucks):
+            routing.SetVehicleUsedWhenEmpty(True, k)
+            stops.SetCumulVarSoftLowerBound(routing.End(k), 1, penalty)
+    return manager, routing
+
+
+def cvrptw_search_parameters(time_limit=5):
+    """Cheapest insertion (suits time windows) improved by guided local search for time_limit seconds."""
+    parameters = pywrapcp.DefaultRoutingSearchParameters()
+    parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION
+    parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+    return parameters
+
+
+def solve_cvrptw_routing(data, time_limit=5, service_time_customer=20, service_time_depot=60, use_all_trucks=True):
+    """
+    Solves the routing model of build_cvrptw_routing. Returns ({k: [(location index, arrival), ...]},
+    objective) with the same route format as sparse_milp.cvrptw_routes_from_solution, or (None, None).
+    """
+    manager, routing = build_cvrptw_routing(data, service_time_customer, service_time_depot, use_all_trucks)
+    solution = routing.SolveWithParameters(cvrptw_search_parameters(time_limit))
+    if not solution:
+        return None, None
+    time_dimension = routing.GetDimensionOrDie("Time")
+    routes = {}
+    for k in range(len(data.truck_weight)):
+        index = routing.Start(k)
+        if routing.IsEnd(solution.Value(routing.NextVar(index))):
+            continue
+        route = []
+        while True:
+            route.append((manager.IndexToNode(index), float(solution.Min(time_dimension.CumulVar(index)))))
+            if routing.IsEnd(index):
+                break
+            index = solution.Value(routing.NextVar(index))
+        # The route ends back at the depot; its arrival there is not constrained in the MILP
+        routes[k] = route
+    return routes, solution.ObjectiveValue()
+
+
+def set_mip_start(x, t, I, routes, locations, start_minutes):
+    """
+    Sets the routes as a complete MIP start on the PuLP variables of CVRPTW (1).py: every x, t and
+    I gets an initial value (t of locations off the route at their window start). Returns the
+    number of route arcs that have no x variable, which makes the start incomplete.
+    """
+    index = {code: pos for pos, code in enumerate(locations)}
+    for var in x.values():
+        var.setInitialValue(0)
+    for (code, k), var in t.items():
+        var.setInitialValue(float(start_minutes[index[code]]))
+    n_trucks = len(I)
+    for k in range(n_trucks):
+        I[k].setInitialValue(int(k in routes))
+
+    missing = 0
+    for k, route in routes.items():
+        for (i, arrival), (j, _) in zip(route, route[1:]):
+            key = (locations[i], locations[j], k)
+            if key in x:
+                x[key].setInitialValue(1)
+            else:
+                missing += 1
+        for i, arrival in route[:-1]:
+            t[(locations[i], k)].setInitialValue(arrival)
+    return missing
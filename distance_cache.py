@@ -0,0 +1,89 @@
+import hashlib
+import os
+
+import numpy as np
+
+from tsp_distance import haversine_matrix
+
+CACHE_VERSION = 1  # Bump to invalidate every cached matrix after a change in how distances are computed
+DEFAULT_CACHE_DIR = os.environ.get(
+    'TSP_DISTANCE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'tsp_distance')
+)
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3  # Cache directory size bound (4 GB)
+
+METRICS = {
+    'haversine': haversine_matrix,
+}
+
+
+def coordinates_key(coordinates, metric='haversine', dtype=np.float64):
+    """Returns the cache key: a hash of the coordinates, the metric and the matrix dtype."""
+    coords = np.ascontiguousarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    digest = hashlib.sha256()
+    digest.update(f'v{CACHE_VERSION}|{metric}|{np.dtype(dtype).str}|{coords.shape[0]}|'.encode())
+    digest.update(coords.tobytes())
+    return digest.hexdigest()
+
+
+def _open_cached(path, n, dtype):
+    try:
+        matrix = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if matrix.shape != (n, n) or matrix.dtype != np.dtype(dtype):
+        return None
+    return matrix
+
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, keep=()):
+    """Deletes least recently used matrices until the cache directory fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith('.npy') or path in keep:
+            continue
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:  # Removed by another process in the meantime
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entries) + sum(os.path.getsize(p) for p in keep if os.path.exists(p))
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cached_distance_matrix(coordinates, metric='haversine', dtype=np.float64,
+                           cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Returns the distance matrix for `coordinates` as a read-only memory map from the on-disk cache,
+    computing and storing it first on a miss.
+
+    Entries are .npy files named by coordinates_key, so any change in the input, the metric or
+    CACHE_VERSION is a different key; unreadable or mismatched files are recomputed. Writes go
+    to a temporary file and are renamed into place, so parallel workers can share the directory.
+    """
+    n = len(coordinates)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, coordinates_key(coordinates, metric, dtype) + '.npy')
+
+    if os.path.exists(path):
+        matrix = _open_cached(path, n, dtype)
+        if matrix is not None:
+            os.utime(path)  # Mark as recently used for the eviction policy
+            return matrix
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(n, n))
+    METRICS[metric](coordinates, chunk_size=1024, out=out)
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+    evict(cache_dir, max_bytes, keep=(path,))
+    return np.load(path, mmap_mode='r')
@@ -0,0 +1,214 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from candidate_graph import top_k_candidates
+from tsp_distance import EARTH_RADIUS_KM, _to_radians
+
+
+def make_distance(distance_matrix=None, coordinates=None):
+    """Returns dist(a, b) for index arrays a, b: matrix lookups, or haversine on the fly without a matrix."""
+    if distance_matrix is not None:
+        matrix = np.asarray(distance_matrix)
+        return lambda a, b: matrix[a, b]
+    # Radians and cos(lat) once up front; the search calls this hundreds of thousands of times
+    lat, lng = _to_radians(coordinates)
+    cos_lat = np.cos(lat)
+
+    def dist(a, b):
+        d = np.sin((lat[b] - lat[a]) * 0.5) ** 2 + cos_lat[a] * cos_lat[b] * np.sin((lng[b] - lng[a]) * 0.5) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(d, 1.0)))
+    return dist
+
+
+def neighbor_array(coordinates=None, candidates=None, k=10):
+    """Returns an n x k array with the k candidate neighbors of every city."""
+    if candidates is None:
+        candidates = top_k_candidates(coordinates, k)
+    counts = np.diff(candidates.indptr)
+    width = counts.max()
+    nbrs = np.empty((len(counts), width), dtype=np.int64)
+    for i in np.flatnonzero(counts < width):  # Pad short rows (union / radius arc sets) with their first neighbor
+        nbrs[i] = candidates.heads[candidates.indptr[i]]
+    cols = np.arange(len(candidates.heads)) - np.repeat(candidates.indptr[:-1], counts)
+    nbrs[np.repeat(np.arange(len(counts)), counts), cols] = candidates.heads
+    return nbrs
+
+
+def tour_length(tour, dist):
+    tour = np.asarray(tour)
+    return float(np.sum(dist(tour, np.roll(tour, -1))))
+
+
+def _reverse(tour, pos, i, j):
+    """Reverses the cyclic tour segment from position i to position j (inclusive), or its complement if shorter."""
+    n = len(tour)
+    length = (j - i) % n + 1
+    if 2 * length > n:
+        i, j = (j + 1) % n, (i - 1) % n
+        length = n - length
+    idx = (i + np.arange(length)) % n
+    tour[idx] = tour[idx[::-1]]
+    pos[tour[idx]] = idx
+
+
+def _move_segment(tour, pos, start, length, after, reverse):
+    """Moves the `length` cities starting at position `start` to just after city `after`."""
+    n = len(tour)
+    rotated = np.roll(tour, -start)
+    segment, rest = rotated[:length], rotated[length:]
+    q = int(np.flatnonzero(rest == after)[0]) + 1
+    tour[:] = np.concatenate((rest[:q], segment[::-1] if reverse else segment, rest[q:]))
+    pos[tour] = np.arange(n)
+
+
+def strip_tour(coordinates):
+    """Returns a quick O(n log n) starting tour: boustrophedon strips of latitude, alternately west-east and east-west."""
+    coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    strips = max(1, int(np.sqrt(n / 2)))
+    lat_rank = np.argsort(np.argsort(coords[:, 0]))
+    strip = lat_rank * strips // n
+    direction = np.where(strip % 2 == 0, 1.0, -1.0)
+    tour = np.lexsort((direction * coords[:, 1], strip))
+    return tour.tolist()
+
+
+def improve_tour(tour, distance_matrix=None, coordinates=None, candidates=None, k=10,
+                 two_opt=True, or_opt_max_len=3, time_limit=None):
+    """
+    Improves a closed tour with 2-opt, Or-opt (segments of 1..or_opt_max_len cities, both
+    orientations) and 2h-opt moves, restricted to candidate neighbors.
+
+    2h-opt is 2-opt combined with single-city insertion; both move types are scored for the same
+    city in one pass. For each city all candidate moves are scored as NumPy arrays over its
+    neighbor list and the best improving one is applied. Don't-look bits keep only cities next
+    to a changed edge in the work queue. Distances come from distance_matrix, or from coordinates
+    without a matrix. Returns (tour, length, stats).
+    """
+    dist = make_distance(distance_matrix, coordinates)
+    nbrs = neighbor_array(coordinates, candidates, k)
+    tour = np.array(tour, dtype=np.int64)
+    n = len(tour)
+    pos = np.empty(n, dtype=np.int64)
+    pos[tour] = np.arange(n)
+    start_length = tour_length(tour, dist)
+    stats = {'two_opt': 0, 'or_opt': 0, 'evaluations': 0}
+    if n < 5:
+        return tour.tolist(), start_length, stats
+
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    queue = deque(tour.tolist())
+    queued = np.ones(n, dtype=bool)  # Don't-look bits: a city is only looked at again once it is queued
+
+    def wake(*cities):
+        for c in cities:
+            if not queued[c]:
+                queued[c] = True
+                queue.append(c)
+
+    while queue:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        a = queue.popleft()
+        queued[a] = False
+        stats['evaluations'] += 1
+        pa, sa = tour[(pos[a] - 1) % n], tour[(pos[a] + 1) % n]
+        c = nbrs[a]
+        pc, sc = tour[(pos[c] - 1) % n], tour[(pos[c] + 1) % n]
+        d_ac = dist(a, c)
+        best, best_move = -1e-9, None
+
+        if two_opt:
+            # (a, sa), (c, sc) -> (a, c), (sa, sc)
+            delta = d_ac + dist(sa, sc) - dist(a, sa) - dist(c, sc)
+            delta[(c == sa) | (c == a)] = np.inf
+            m = int(np.argmin(delta))
+            if delta[m] < best:
+                best, best_move = delta[m], ('2opt_succ', c[m])
+            # (pa, a), (pc, c) -> (a, c), (pa, pc)
+            delta = d_ac + dist(pa, pc) - dist(pa, a) - dist(pc, c)
+            delta[(c == pa) | (c == a)] = np.inf
+            m = int(np.argmin(delta))
+            if delta[m] < best:
+                best, best_move = delta[m], ('2opt_pred', c[m])
+
+        for length in range(1, min(or_opt_max_len, n - 3) + 1):
+            # Segment a .. s_last, between pa and e; reinsert it next to a candidate neighbor c of a
+            last = tour[(pos[a] + length - 1) % n]
+            e = tour[(pos[a] + length) % n]
+            removed = dist(pa, a) + dist(last, e) - dist(pa, e)
+            in_segment = (pos[c] - pos[a]) % n < length
+            # c -> a .. last -> sc
+            delta = d_ac + dist(last, sc) - dist(c, sc) - removed
+            delta[in_segment | (c == pa)] = np.inf
+            m = int(np.argmin(delta))
+            if delta[m] < best:
+                best, best_move = delta[m], ('or_after', c[m], length)
+            # pc -> last .. a -> c
+            delta = d_ac + dist(pc, last) - dist(pc, c) - removed
+            delta[in_segment | (c == e)] = np.inf
+            m = int(np.argmin(delta))
+            if delta[m] < best:
+                best, best_move = delta[m], ('or_before', c[m], length)
+
+        if best_move is None:
+            continue
+
+        move, c = best_move[0], int(best_move[1])
+        if move == '2opt_succ':
+            wake(a, sa, c, tour[(pos[c] + 1) % n])
+            _reverse(tour, pos, (pos[a] + 1) % n, pos[c])
+            stats['two_opt'] += 1
+        elif move == '2opt_pred':
+            wake(a, pa, c, tour[(pos[c] - 1) % n])
+            _reverse(tour, pos, pos[a], (pos[c] - 1) % n)
+            stats['two_opt'] += 1
+        else:
+            length = best_move[2]
+            last = tour[(pos[a] + length - 1) % n]
+            e = tour[(pos[a] + length) % n]
+            if move == 'or_after':
+                wake(a, last, pa, e, c, tour[(pos[c] + 1) % n])
+                _move_segment(tour, pos, pos[a], length, c, reverse=False)
+            else:
+                pc = tour[(pos[c] - 1) % n]
+                wake(a, last, pa, e, c, pc)
+                _move_segment(tour, pos, pos[a], length, pc, reverse=True)
+            stats['or_opt'] += 1
+
+    return tour.tolist(), tour_length(tour, dist), stats
+
+
+if __name__ == '__main__':
+    # Benchmark against the current OR-Tools output: python local_search.py [tsp_input.csv | number of random cities]
+    import sys
+    import pandas as pd
+    from distance_cache import cached_distance_matrix
+    from ortools_tsp import solve_tsp_ortools
+
+    if len(sys.argv) > 1 and sys.argv[1].isdigit():
+        rng = np.random.default_rng(0)
+        n = int(sys.argv[1])
+        coordinates = np.column_stack((rng.uniform(8, 35, n), rng.uniform(68, 97, n)))
+    else:
+        df = pd.read_csv(sys.argv[1] if len(sys.argv) > 1 else 'tsp_input.csv')
+        coordinates = list(zip(df['Latitude'], df['Longitude']))
+    n = len(coordinates)
+    candidates = top_k_candidates(coordinates, 10)
+
+    if n <= 500:  # OR-Tools with a Python cost callback over the full matrix takes minutes beyond this
+        distance_matrix = cached_distance_matrix(coordinates)
+        start = time.perf_counter()
+        tour, objective = solve_tsp_ortools(n, distance_matrix=distance_matrix)
+        if tour is not None:
+            print(f'OR-Tools PATH_CHEAPEST_ARC: {objective:.1f} km in {time.perf_counter() - start:.2f} s')
+            start = time.perf_counter()
+            tour, length, stats = improve_tour(tour, distance_matrix=distance_matrix, candidates=candidates)
+            print(f'  + 2-opt/Or-opt: {length:.1f} km in {time.perf_counter() - start:.2f} s, {stats}')
+
+    start = time.perf_counter()
+    tour = strip_tour(coordinates)
+    tour, length, stats = improve_tour(tour, coordinates=coordinates, candidates=candidates)
+    print(f'Strip tour + 2-opt/Or-opt: {length:.1f} km in {time.perf_counter() - start:.2f} s, {stats}')
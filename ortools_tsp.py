@@ -0,0 +1,190 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from ortools.constraint_solver import routing_enums_pb2
+from ortools.constraint_solver import pywrapcp
+
+from candidate_graph import arc_lengths_dict, neighbors, relabel_arcs
+from telemetry import ortools_trajectory
+from tsp_distance import haversine_pairs
+
+
+def restrict_to_candidates(manager, routing, candidates):
+    """Limits each node's successor to its candidate arcs (closing arcs into the depot go to the route end)."""
+    depot = manager.IndexToNode(routing.Start(0))
+    for node in range(len(candidates.indptr) - 1):
+        index = manager.NodeToIndex(node)
+        allowed = [
+            routing.End(0) if j == depot else manager.NodeToIndex(j)
+            for j in neighbors(candidates, node).tolist()
+        ]
+        routing.NextVar(index).SetValues(allowed)
+
+
+def solve_tsp_ortools(n, distance_matrix=None, candidates=None, coordinates=None, depot=0,
+                      first_solution_strategy='PATH_CHEAPEST_ARC', local_search_metaheuristic=None,
+                      time_limit=None, trajectory=None):
+    """
+    Solves the TSP with the OR-Tools routing solver in process.
+
+    Costs come from distance_matrix (km) or, for large instances, from the sparse candidate arcs
+    (successors are then restricted to those arcs; coordinates are needed to price any other arc).
+    Returns (tour, objective_km) with the tour as city indices starting at the depot, or (None, None).
+    If a `trajectory` list is given, every improving solution is appended to it (see telemetry.ortools_trajectory).
+    """
+    manager = pywrapcp.RoutingIndexManager(n, 1, depot)
+    routing = pywrapcp.RoutingModel(manager)
+
+    if candidates is not None:
+        arc_length = arc_lengths_dict(candidates)
+
+        def distance_callback(from_index, to_index):
+            """Returns the distance between the two nodes from the sparse candidate arcs."""
+            from_node = manager.IndexToNode(from_index)
+            to_node = manager.IndexToNode(to_index)
+            if from_node == to_node:
+                return 0
+            distance = arc_length.get((from_node, to_node))
+            if distance is None:  # Arc outside the candidate set, only evaluated rarely by the search
+                distance = haversine_pairs(coordinates, [from_node], [to_node])[0]
+            return int(distance * 1000)
+
+        restrict_to_candidates(manager, routing, candidates)
+        if time_limit is None:
+            # A k-nearest-neighbor graph may have no Hamiltonian cycle; don't let the search run unbounded
+            time_limit = 60
+    else:
+        def distance_callback(from_index, to_index):
+            """Returns the distance between the two nodes."""
+            # Convert from routing variable Index to distance matrix NodeIndex.
+            from_node = manager.IndexToNode(from_index)
+            to_node = manager.IndexToNode(to_index)
+            return int(distance_matrix[from_node][to_node] * 1000)
+
+    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+
+    # Define cost of each arc.
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy, first_solution_strategy
+    )
+    if local_search_metaheuristic is not None:
+        search_parameters.local_search_metaheuristic = getattr(
+            routing_enums_pb2.LocalSearchMetaheuristic, local_search_metaheuristic
+        )
+    if time_limit is not None:
+        search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+
+    if trajectory is not None:
+        ortools_trajectory(routing, trajectory)
+
+    solution = routing.SolveWithParameters(search_parameters)
+    if not solution:
+        return None, None
+
+    tour = []
+    index = routing.Start(0)
+    while not routing.IsEnd(index):
+        tour.append(manager.IndexToNode(index))
+        index = solution.Value(routing.NextVar(index))
+    return tour, solution.ObjectiveValue() / 1000
+
+
+# Portfolio configurations: (first solution strategy, metaheuristic, seed). Seed 0 solves the
+# instance as given; other seeds shuffle the city order, which changes the ties and neighbor
+# order the heuristics see (the routing solver has no random seed of its own)
+PORTFOLIO = [
+    ('PATH_CHEAPEST_ARC', 'GUIDED_LOCAL_SEARCH', 0),
+    ('PATH_CHEAPEST_ARC', 'GUIDED_LOCAL_SEARCH', 1),
+    ('CHRISTOFIDES', 'GUIDED_LOCAL_SEARCH', 0),
+    ('PARALLEL_CHEAPEST_INSERTION', 'GUIDED_LOCAL_SEARCH', 0),
+    ('PATH_CHEAPEST_ARC', 'TABU_SEARCH', 0),
+    ('SAVINGS', 'TABU_SEARCH', 1),
+    ('PATH_CHEAPEST_ARC', 'SIMULATED_ANNEALING', 0),
+    ('LOCAL_CHEAPEST_INSERTION', 'SIMULATED_ANNEALING', 1),
+]
+
+_instance = {}  # The TSP of the portfolio, sent once to each worker process by _init_portfolio
+
+
+def _init_portfolio(instance):
+    _instance.update(instance)
+
+
+def _portfolio_run(configuration, time_limit, deadline):
+    """Process pool worker: solves the shared instance with one portfolio configuration."""
+    strategy, metaheuristic, seed = configuration
+    result = {'first_solution_strategy': strategy, 'local_search_metaheuristic': metaheuristic, 'seed': seed,
+              'objective': None, 'seconds': 0.0, 'time_to_best': None}
+    # Runs of a later wave only get what is left of the shared budget
+    time_limit = min(time_limit, deadline - time.time())
+    if time_limit < 0.1:
+        result['status'] = 'skipped'
+        return result, None
+
+    n, depot = _instance['n'], _instance['depot']
+    distance_matrix, candidates, coordinates = _instance['distance_matrix'], _instance['candidates'], _instance['coordinates']
+    label = np.arange(n)
+    if seed:
+        # City label[i] of the shuffled instance is city i of the original (the inverse permutation)
+        order = np.random.default_rng(seed).permutation(n)
+        label[order] = np.arange(n)
+        if distance_matrix is not None:
+            distance_matrix = np.asarray(distance_matrix)[np.ix_(order, order)]
+        if candidates is not None:
+            candidates = relabel_arcs(candidates, label)
+        if coordinates is not None:
+            coordinates = np.asarray(coordinates)[order]
+        depot = int(label[depot])
+
+    trajectory = []
+    start = time.perf_counter()
+    tour, objective = solve_tsp_ortools(
+        n, distance_matrix=distance_matrix, candidates=candidates, coordinates=coordinates, depot=depot,
+        first_solution_strategy=strategy, local_search_metaheuristic=metaheuristic,
+        time_limit=time_limit, trajectory=trajectory,
+    )
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    if tour is None:
+        result['status'] = 'no_solution'
+        return result, None
+    if seed:
+        tour = order[tour].tolist()
+    result.update(status='ok', objective=objective,
+                  time_to_best=round(trajectory[-1]['seconds'], 3) if trajectory else None)
+    return result, tour
+
+
+def solve_tsp_portfolio(n, distance_matrix=None, candidates=None, coordinates=None, depot=0,
+                        configurations=None, time_limit=30, workers=None):
+    """
+    Runs several OR-Tools configurations (PORTFOLIO by default) on the same TSP in a process pool
+    under one wall-clock budget of time_limit seconds. The configurations run in waves of `workers`
+    (CPU count by default), each wave getting an equal share of the budget.
+    Returns (tour, objective_km, results): the best tour as solve_tsp_ortools returns it, and one
+    record per configuration (objective, seconds, time of its best solution, status), so the
+    winning configuration can be looked up per instance.
+    """
+    configurations = configurations or PORTFOLIO
+    workers = min(workers or os.cpu_count() or 1, len(configurations))
+    run_limit = time_limit / math.ceil(len(configurations) / workers)
+    deadline = time.time() + time_limit
+    instance = {'n': n, 'distance_matrix': distance_matrix, 'candidates': candidates,
+                'coordinates': coordinates, 'depot': depot}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_portfolio, initargs=(instance,)) as pool:
+        futures = [pool.submit(_portfolio_run, configuration, run_limit, deadline) for configuration in configurations]
+        runs = [future.result() for future in futures]
+
+    results = [result for result, _ in runs]
+    solved = [(result['objective'], position) for position, (result, tour) in enumerate(runs) if tour is not None]
+    if not solved:
+        return None, None, results
+    objective, best = min(solved)
+    results[best]['best'] = True
+    return runs[best][1], objective, results
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def variable_values(variables):
+    """
+    Reads the solution values of a {key: LpVariable} dict in one pass.
+    Returns (keys, values) with values as a float array (unset variables read as 0).
+    """
+    keys = list(variables)
+    values = np.fromiter((var.varValue or 0.0 for var in variables.values()), dtype=np.float64, count=len(keys))
+    return keys, values
+
+
+def successor_array(tails, heads, values, n, tol=0.5):
+    """Returns successor[i] = j for every arc i -> j with value > tol (-1 where a city has none)."""
+    selected = np.asarray(values) > tol
+    successor = np.full(n, -1, dtype=np.int64)
+    successor[np.asarray(tails)[selected]] = np.asarray(heads)[selected]
+    return successor
+
+
+def walk_successors(successor, start):
+    """
+    Follows the successor array from `start` and returns the route [start, ..., start].
+    Stops after len(successor) steps or at a city without successor, so a broken solution never
+    loops forever; such a route does not end at `start`.
+    """
+    successor = successor.tolist()
+    route = [start]
+    i = successor[start]
+    while i != start and i != -1 and len(route) <= len(successor):
+        route.append(i)
+        i = successor[i]
+    if i == start:
+        route.append(start)
+    return route
+
+
+def tsp_tour(x, n, start=0, tol=0.5):
+    """Returns the closed tour [start, ..., start] of a solved PuLP TSP with arc variables x[i, j]."""
+    keys, values = variable_values(x)
+    tails, heads = np.array(keys, dtype=np.int64).reshape(-1, 2).T
+    return walk_successors(successor_array(tails, heads, values, n, tol), start)
+
+
+def cvrptw_routes(x, t, locations, n_trucks, depot, tol=0.5):
+    """
+    Returns {k: [(location, arrival_minutes), ...]} for every truck that leaves the depot in a solved
+    PuLP CVRPTW, in visiting order from the depot back to the depot.
+    x is keyed by (i, j, k) and t by (i, k), with i, j location codes.
+    Raises ValueError if a truck's selected arcs are not one closed walk from the depot, instead
+    of leaving out the arcs the walk does not reach.
+    """
+    index = {code: pos for pos, code in enumerate(locations)}
+    n = len(locations)
+    keys, values = variable_values(x)
+    tails = np.fromiter((index[i] for i, _, _ in keys), dtype=np.int64, count=len(keys))
+    heads = np.fromiter((index[j] for _, j, _ in keys), dtype=np.int64, count=len(keys))
+    trucks = np.fromiter((k for _, _, k in keys), dtype=np.int64, count=len(keys))
+    # Self-loops carry no route information
+    values = np.where(tails == heads, 0.0, values)
+
+    arrival = np.zeros((n_trucks, n))
+    t_keys, t_values = variable_values(t)
+    for (i, k), value in zip(t_keys, t_values.tolist()):
+        arrival[k, index[i]] = value
+
+    # One successor row per truck
+    selected = values > tol
+    successor = np.full((n_trucks, n), -1, dtype=np.int64)
+    successor[trucks[selected], tails[selected]] = heads[selected]
+
+    routes, lost = {}, []
+    for k in range(n_trucks):
+        on_truck = selected & (trucks == k)
+        route = walk_successors(successor[k], index[depot]) if successor[k, index[depot]] != -1 else []
+        walked = set(zip(route, route[1:]))
+        lost += [(locations[i], locations[j], k) for i, j in zip(tails[on_truck].tolist(), heads[on_truck].tolist())
+                 if (i, j) not in walked]
+        if route and route[-1] != index[depot]:
+            lost.append((locations[route[-1]], None, k))
+        if route:
+            routes[k] = [(locations[i], float(arrival[k, i])) for i in route]
+    if lost:
+        raise ValueError(f'{len(lost)} selected arcs are not on a closed route from the depot, e.g. {lost[:5]}')
+    return routes
@@ -0,0 +1,53 @@
+import folium
+import numpy as np
+from folium.plugins import FastMarkerCluster
+
+MARKER_LIMIT = 200  # Above this many stops, 'auto' draws one clustered layer instead of a Marker per stop
+
+# Leaflet callback of FastMarkerCluster: one plain marker per [lat, lng] row, tooltip as in the Marker mode
+_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindTooltip(row[0] + ', ' + row[1]);
+    return marker;
+};
+"""
+
+
+def route_coordinates(optimal_route, coordinates, places, precision=5):
+    """Looks up the route's coordinates through a place -> index dict; returns an (m, 2) array."""
+    index = {place: i for i, place in enumerate(places)}
+    coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    # 5 decimals is about 1 m, and keeps the embedded JSON short
+    return np.round(coords[[index[place] for place in optimal_route]], precision)
+
+
+def route_map(optimal_route, coordinates, places, mode='auto', smooth_factor=None, zoom_start=6):
+    """
+    Returns a folium map with a marker per stop and the route as a single polyline.
+
+    mode='markers' adds one folium.Marker per stop (popup and tooltip show the coordinates).
+    mode='cluster' adds all stops as one FastMarkerCluster layer, a single JS array clustered
+    in the browser. The HTML size and render time then grow linearly and stay usable for
+    thousands of stops. 'auto' switches to 'cluster' above MARKER_LIMIT stops.
+    smooth_factor is Leaflet's polyline simplification, which is stronger at low zoom. It
+    defaults to 1.0, or 2.0 in cluster mode.
+    """
+    points = route_coordinates(optimal_route, coordinates, places)
+    if mode == 'auto':
+        mode = 'cluster' if len(points) > MARKER_LIMIT else 'markers'
+    if smooth_factor is None:
+        smooth_factor = 2.0 if mode == 'cluster' else 1.0
+    m = folium.Map(location=points[0].tolist(), zoom_start=zoom_start)
+
+    stops = points.tolist()
+    if mode == 'cluster':
+        # The closing depot row of a closed tour would be a duplicate marker
+        unique_stops = stops[:-1] if len(stops) > 1 and stops[0] == stops[-1] else stops
+        FastMarkerCluster(unique_stops, callback=_MARKER_CALLBACK).add_to(m)
+    else:
+        for stop in stops:
+            folium.Marker(location=stop, popup=tuple(stop), tooltip=tuple(stop)).add_to(m)
+
+    folium.PolyLine(locations=stops, color='blue', smooth_factor=smooth_factor).add_to(m)
+    return m
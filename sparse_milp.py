@@ -0,0 +1,453 @@
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix
+
+from cvrptw_arcs import arc_big_m
+from route_extraction import successor_array, walk_successors
+
+
+def measure_build(build, *args, **kwargs):
+    """Runs build(*args, **kwargs) and returns (result, seconds, peak memory in MB traced by tracemalloc)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = build(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+
+def _rows(blocks, n_cols):
+    """Stacks (rows, cols, vals, lower, upper) blocks into one CSR matrix with its row bounds."""
+    offset, rows, cols, vals, lower, upper = 0, [], [], [], [], []
+    for r, c, v, lo, hi in blocks:
+        rows.append(np.asarray(r) + offset)
+        cols.append(c)
+        vals.append(v)
+        lower.append(lo)
+        upper.append(hi)
+        offset += len(lo)
+    A = coo_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(offset, n_cols)
+    ).tocsr()
+    return A, np.concatenate(lower), np.concatenate(upper)
+
+
+def build_tsp_milp(distance_matrix=None, candidates=None):
+    """
+    Builds the MTZ TSP of the PuLP scripts directly as sparse matrices.
+
+    Columns are the arcs x (binary) followed by the sequence numbers s (integer). Pass either the
+    full distance matrix or a candidate_graph.CandidateArcs set for the pruned variants.
+    """
+    if candidates is not None:
+        n = len(candidates.indptr) - 1
+        tails = np.repeat(np.arange(n), np.diff(candidates.indptr))
+        heads = np.asarray(candidates.heads)
+        cost = np.asarray(candidates.lengths, dtype=np.float64)
+    else:
+        distance_matrix = np.asarray(distance_matrix, dtype=np.float64)
+        n = len(distance_matrix)
+        tails, heads = np.nonzero(~np.eye(n, dtype=bool))
+        cost = distance_matrix[tails, heads]
+    m = len(tails)
+    arc_ids = np.arange(m)
+    ones = np.ones(m)
+
+    # Sub-tour elimination: s_i - s_j + n * x_i,j <= n - 1 for arcs not touching city 0
+    mtz = np.flatnonzero((tails != 0) & (heads != 0))
+    k = len(mtz)
+    mtz_rows = np.repeat(np.arange(k), 3)
+    mtz_cols = np.column_stack((m + tails[mtz], m + heads[mtz], mtz)).ravel()
+    mtz_vals = np.tile([1.0, -1.0, float(n)], k)
+
+    A, lower, upper = _rows([
+        (tails, arc_ids, ones, np.ones(n), np.ones(n)),  # Outgoing_sum_i == 1
+        (heads, arc_ids, ones, np.ones(n), np.ones(n)),  # Incoming_sum_j == 1
+        (mtz_rows, mtz_cols, mtz_vals, np.full(k, -np.inf), np.full(k, n - 1.0)),
+    ], m + n)
+
+    return {
+        'c': np.concatenate((cost, np.zeros(n))),
+        'A': A,
+        'lower': lower,
+        'upper': upper,
+        'lb': np.zeros(m + n),
+        'ub': np.concatenate((np.ones(m), np.full(n, n - 1.0))),
+        'integrality': np.ones(m + n),
+        'tails': tails,
+        'heads': heads,
+        'n': n,
+    }
+
+
+def lp_relaxation_bound(model):
+    """Objective of the model's LP relaxation (the root bound before cuts), or None if it does not solve."""
+    result = milp(
+        model['c'],
+        constraints=LinearConstraint(model['A'], model['lower'], model['upper']),
+        bounds=Bounds(model['lb'], model['ub']),
+    )
+    return result.fun if result.status == 0 else None
+
+
+def solve_milp_model(model, time_limit=None, mip_rel_gap=None):
+    """Solves a model from this module with HiGHS through scipy.optimize.milp."""
+    options = {}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+    if mip_rel_gap is not None:
+        options['mip_rel_gap'] = mip_rel_gap
+    return milp(
+        model['c'],
+        constraints=LinearConstraint(model['A'], model['lower'], model['upper']),
+        integrality=model['integrality'],
+        bounds=Bounds(model['lb'], model['ub']),
+        options=options,
+    )
+
+
+def tour_from_solution(model, solution, start=0):
+    """Walks the successor array of the selected arcs; returns the closed tour as city indices."""
+    m = len(model['tails'])
+    successor = successor_array(model['tails'], model['heads'], solution.x[:m], model['n'])
+    return walk_successors(successor, start)
+
+
+def build_cvrptw_milp(distance, travel_time, start_minutes, end_minutes, location_weight, truck_weight,
+                      depot, service_time_customer=20, service_time_depot=60, big_m=1e5, arc_mask=None,
+                      truck_class=None, linking='arc'):
+    """
+    Builds the CVRPTW of CVRPTW (1).py directly as sparse matrices, with the same variables and constraint families.
+
+    Flow balancing is written as separate leave-once / enter-once rows plus the per-truck
+    conservation rows that are commented out there (otherwise two trucks can swap a pair of
+    customers), self-loops x[k, i, i] are fixed to 0 and arcs back into the depot get no
+    Service_Time row (with a single t[k, depot] every closed route would otherwise violate it).
+
+    distance / travel_time are n x n arrays over the location list, start/end_minutes are per
+    location, location_weight is the total order weight delivered at each location and
+    truck_weight holds the K truck capacities.
+    arc_mask is an optional (K, n, n) bool array (cvrptw_arcs.feasible_arc_mask); only those arcs get an x column.
+    truck_class is an optional class per truck (cvrptw_data.truck_classes); consecutive trucks of
+    a class then get symmetry-breaking rows, see symmetry_rows.
+
+    big_m=None takes a big-M per arc from the windows (cvrptw_arcs.arc_big_m) and leaves out the
+    Service_Time rows that can never bind. linking='degree' replaces the K * n^2 rows
+    x[k, i, j] <= I_k by one row per truck and location, sum_j x[k, i, j] <= I_k: a truck leaves
+    every location at most once.
+    Columns are x[k, i, j] (binary, k-major), then t[k, i] (continuous), then I[k] (binary).
+    """
+    distance = np.asarray(distance, dtype=np.float64)
+    travel_time = np.asarray(travel_time, dtype=np.float64)
+    location_weight = np.asarray(location_weight, dtype=np.float64)
+    truck_weight = np.asarray(truck_weight, dtype=np.float64)
+    n, K = len(distance), len(truck_weight)
+    if arc_mask is None:
+        arc_mask = np.ones((K, n, n), dtype=bool)
+    k_idx, i_idx, j_idx = np.unravel_index(np.flatnonzero(arc_mask), (K, n, n))
+    nx = len(k_idx)
+    t0, i0 = nx, nx + K * n
+    n_cols = i0 + K
+
+    x_ids = np.arange(nx)
+    customers = np.setdiff1d(np.flatnonzero(location_weight > 0), [depot])
+    others = np.setdiff1d(np.arange(n), [depot])
+    blocks = []
+
+    # Flow_Balancing: every customer is left once and entered once, over all trucks
+    row_of = np.full(n, -1)
+    row_of[customers] = np.arange(len(customers))
+    for ends in (i_idx, j_idx):
+        sel = row_of[ends] >= 0
+        ones = np.ones(len(customers))
+        blocks.append((row_of[ends[sel]], x_ids[sel], np.ones(sel.sum()), ones, ones))
+
+    # customer_source_to_dest_h_k: a truck that arrives at a customer leaves it again
+    rows = k_idx * n
+    blocks.append((
+        np.concatenate((rows + j_idx, rows + i_idx)),
+        np.concatenate((x_ids, x_ids)),
+        np.concatenate((np.ones(nx), -np.ones(nx))),
+        np.zeros(K * n), np.zeros(K * n),
+    ))
+
+    # Demand_k: sum(weight_i * x[k, i, j]) - W_k * I_k <= 0
+    sel = location_weight[i_idx] > 0
+    blocks.append((
+        np.concatenate((k_idx[sel], np.arange(K))),
+        np.concatenate((x_ids[sel], i0 + np.arange(K))),
+        np.concatenate((location_weight[i_idx[sel]], -truck_weight)),
+        np.full(K, -np.inf), np.zeros(K),
+    ))
+
+    # Leave_Depot_k / Arrive_Depot_k == 1
+    ones = np.ones(K)
+    sel = (i_idx == depot) & np.isin(j_idx, others)
+    blocks.append((k_idx[sel], x_ids[sel], np.ones(sel.sum()), ones, ones))
+    sel = (j_idx == depot) & np.isin(i_idx, others)
+    blocks.append((k_idx[sel], x_ids[sel], np.ones(sel.sum()), ones, ones))
+
+    # Service_Time: t[k, j] - t[k, i] - M * x[k, i, j] >= service + travel - M
+    sel = np.flatnonzero((i_idx != j_idx) & (j_idx != depot))
+    if big_m is None:
+        m = arc_big_m(travel_time, start_minutes, end_minutes, depot,
+                      service_time_customer, service_time_depot)[i_idx[sel], j_idx[sel]]
+        sel, m = sel[m > 0], m[m > 0]
+    else:
+        m = np.full(len(sel), float(big_m))
+    r = len(sel)
+    service_time = np.where((i_idx[sel] != depot) & (j_idx[sel] != depot), service_time_customer, service_time_depot)
+    rhs = service_time + travel_time[i_idx[sel], j_idx[sel]] - m
+    blocks.append((
+        np.repeat(np.arange(r), 3),
+        np.column_stack((t0 + k_idx[sel] * n + j_idx[sel], t0 + k_idx[sel] * n + i_idx[sel], sel)).ravel(),
+        np.column_stack((np.ones(r), -np.ones(r), -m)).ravel(),
+        rhs, np.full(r, np.inf),
+    ))
+
+    if linking == 'degree':
+        # Linking per truck and location: sum_j x[k, i, j] - I_k <= 0
+        blocks.append((
+            np.concatenate((k_idx * n + i_idx, np.arange(K * n))),
+            np.concatenate((x_ids, i0 + np.repeat(np.arange(K), n))),
+            np.concatenate((np.ones(nx), -np.ones(K * n))),
+            np.full(K * n, -np.inf), np.zeros(K * n),
+        ))
+    else:
+        # Linking: x[k, i, j] - I_k <= 0
+        blocks.append((
+            np.repeat(np.arange(nx), 2),
+            np.column_stack((x_ids, i0 + k_idx)).ravel(),
+            np.tile([1.0, -1.0], nx),
+            np.full(nx, -np.inf), np.zeros(nx),
+        ))
+
+    if truck_class is not None:
+        blocks.extend(symmetry_rows(truck_class, k_idx, i_idx, j_idx, depot, i0))
+
+    A, lower, upper = _rows(blocks, n_cols)
+    cost = distance[i_idx, j_idx] * (20000 - truck_weight[k_idx] / 1000)
+
+    return {
+        'c': np.concatenate((cost, np.zeros(K * n), 2 * truck_weight)),
+        'A': A,
+        'lower': lower,
+        'upper': upper,
+        'lb': np.concatenate((np.zeros(nx), np.tile(start_minutes, K), np.zeros(K))),
+        'ub': np.concatenate(((i_idx != j_idx).astype(float), np.tile(end_minutes, K), np.ones(K))),
+        'integrality': np.concatenate((np.ones(nx), np.zeros(K * n), np.ones(K))),
+        'n': n,
+        'K': K,
+        'depot': depot,
+        'x_k': k_idx,
+        'x_i': i_idx,
+        'x_j': j_idx,
+    }
+
+
+def symmetry_rows(truck_class, k_idx, i_idx, j_idx, depot, i0):
+    """
+    Row blocks that order interchangeable trucks: for consecutive trucks a < b of the same class,
+    I_a >= I_b, and a's first customer has a lower location index than b's. Every truck leaves
+    the depot once and every customer is entered once, so the first customers are distinct and
+    any solution can be renumbered to satisfy both; branch-and-bound then stops exploring
+    permutations of the same routes.
+    """
+    truck_class = np.asarray(truck_class)
+    trucks = np.arange(len(truck_class))
+    order = np.lexsort((trucks, truck_class))
+    same = truck_class[order[:-1]] == truck_class[order[1:]]
+    first, second = order[:-1][same], order[1:][same]
+    p = len(first)
+
+    # Row of each truck as the earlier (+index) and the later (-index) member of a pair
+    as_first = np.full(len(truck_class), -1)
+    as_first[first] = np.arange(p)
+    as_second = np.full(len(truck_class), -1)
+    as_second[second] = np.arange(p)
+    out = np.flatnonzero((i_idx == depot) & (j_idx != depot))
+    lead, lag = out[as_first[k_idx[out]] >= 0], out[as_second[k_idx[out]] >= 0]
+    return [
+        (
+            np.concatenate((as_first[k_idx[lead]], as_second[k_idx[lag]])),
+            np.concatenate((lead, lag)),
+            np.concatenate((j_idx[lead], -j_idx[lag])).astype(float),
+            np.full(p, -np.inf), np.full(p, -1.0),
+        ),
+        (
+            np.repeat(np.arange(p), 2),
+            np.column_stack((i0 + first, i0 + second)).ravel(),
+            np.tile([1.0, -1.0], p),
+            np.zeros(p), np.full(p, np.inf),
+        ),
+    ]
+
+
+def build_cvrptw_milp_by_type(distance, travel_time, start_minutes, end_minutes, location_weight, truck_weight,
+                              truck_class, depot, service_time_customer=20, service_time_depot=60, big_m=1e5,
+                              arc_mask=None):
+    """
+    The CVRPTW of build_cvrptw_milp with the trucks aggregated by class (same type and capacity,
+    cvrptw_data.truck_classes): one x[c, i, j] per class instead of one per truck, so identical
+    trucks are no longer separate copies of the model that branch-and-bound has to tell apart.
+
+    The arcs leaving the depot of class c add up to N[c], fixed to the number of trucks in the
+    class. The per-truck capacity becomes a load flow f[c, i, j] <= W_c * x[c, i, j] that drops by
+    the location weight at every stop, and the arrival time is one t[i] per location, which is
+    enough since every customer is visited once (trucks can wait, so one depot departure time
+    loses nothing). arc_mask is (K, n, n) as for build_cvrptw_milp; a class uses its first truck's.
+    big_m=None takes a big-M per location pair from the windows, as in build_cvrptw_milp.
+    Columns are x[c, i, j] (binary, c-major), f[c, i, j], t[i] (continuous), then N[c] (integer).
+    """
+    distance = np.asarray(distance, dtype=np.float64)
+    travel_time = np.asarray(travel_time, dtype=np.float64)
+    location_weight = np.asarray(location_weight, dtype=np.float64)
+    truck_weight = np.asarray(truck_weight, dtype=np.float64)
+    n = len(distance)
+    _, first_truck, class_of, class_size = np.unique(
+        np.asarray(truck_class), return_index=True, return_inverse=True, return_counts=True)
+    C = len(first_truck)
+    class_weight = truck_weight[first_truck]
+    class_mask = np.ones((C, n, n), dtype=bool) if arc_mask is None else np.asarray(arc_mask)[first_truck]
+    c_idx, i_idx, j_idx = np.unravel_index(np.flatnonzero(class_mask), (C, n, n))
+    nx = len(c_idx)
+    f0, t0 = nx, 2 * nx
+    n0 = t0 + n
+    n_cols = n0 + C
+
+    x_ids = np.arange(nx)
+    customers = np.setdiff1d(np.flatnonzero(location_weight > 0), [depot])
+    others = np.setdiff1d(np.arange(n), [depot])
+    blocks = []
+
+    # Flow_Balancing: every customer is left once and entered once, over all classes
+    row_of = np.full(n, -1)
+    row_of[customers] = np.arange(len(customers))
+    for ends in (i_idx, j_idx):
+        sel = row_of[ends] >= 0
+        ones = np.ones(len(customers))
+        blocks.append((row_of[ends[sel]], x_ids[sel], np.ones(sel.sum()), ones, ones))
+
+    # Conservation per class: a truck that arrives at a location leaves it again
+    rows = c_idx * n
+    blocks.append((
+        np.concatenate((rows + j_idx, rows + i_idx)),
+        np.concatenate((x_ids, x_ids)),
+        np.concatenate((np.ones(nx), -np.ones(nx))),
+        np.zeros(C * n), np.zeros(C * n),
+    ))
+
+    # Leave_Depot_c / Arrive_Depot_c: sum(x) - N_c == 0
+    zeros = np.zeros(C)
+    for sel in ((i_idx == depot) & np.isin(j_idx, others), (j_idx == depot) & np.isin(i_idx, others)):
+        blocks.append((
+            np.concatenate((c_idx[sel], np.arange(C))),
+            np.concatenate((x_ids[sel], n0 + np.arange(C))),
+            np.concatenate((np.ones(sel.sum()), -np.ones(C))),
+            zeros, zeros,
+        ))
+
+    # Load flow at every location but the depot: f in - f out - weight * x in == 0
+    into, out_of = np.flatnonzero(j_idx != depot), np.flatnonzero(i_idx != depot)
+    blocks.append((
+        np.concatenate((rows[into] + j_idx[into], rows[into] + j_idx[into], rows[out_of] + i_idx[out_of])),
+        np.concatenate((f0 + into, into, f0 + out_of)),
+        np.concatenate((np.ones(len(into)), -location_weight[j_idx[into]], -np.ones(len(out_of)))),
+        np.zeros(C * n), np.zeros(C * n),
+    ))
+
+    # Capacity: f[c, i, j] - W_c * x[c, i, j] <= 0
+    blocks.append((
+        np.repeat(np.arange(nx), 2),
+        np.column_stack((f0 + x_ids, x_ids)).ravel(),
+        np.column_stack((np.ones(nx), -class_weight[c_idx])).ravel(),
+        np.full(nx, -np.inf), np.zeros(nx),
+    ))
+
+    # Service_Time per location pair: t[j] - t[i] - M * sum_c x[c, i, j] >= service + travel - M
+    sel = np.flatnonzero((i_idx != j_idx) & (j_idx != depot))
+    pairs, pair_row = np.unique(i_idx[sel] * n + j_idx[sel], return_inverse=True)
+    tails, heads = np.divmod(pairs, n)
+    if big_m is None:
+        m = arc_big_m(travel_time, start_minutes, end_minutes, depot,
+                      service_time_customer, service_time_depot)[tails, heads]
+    else:
+        m = np.full(len(pairs), float(big_m))
+    # Pairs whose row can never bind are left out; renumber the others
+    binding = m > 0
+    row_of_pair = np.cumsum(binding) - 1
+    keep = binding[pair_row]
+    sel, arc_row = sel[keep], row_of_pair[pair_row[keep]]
+    tails, heads, m = tails[binding], heads[binding], m[binding]
+    r = len(m)
+    service_time = np.where((tails != depot) & (heads != depot), service_time_customer, service_time_depot)
+    blocks.append((
+        np.concatenate((np.repeat(np.arange(r), 2), arc_row)),
+        np.concatenate((np.column_stack((t0 + heads, t0 + tails)).ravel(), sel)),
+        np.concatenate((np.tile([1.0, -1.0], r), -m[arc_row])),
+        service_time + travel_time[tails, heads] - m, np.full(r, np.inf),
+    ))
+
+    A, lower, upper = _rows(blocks, n_cols)
+    cost = distance[i_idx, j_idx] * (20000 - class_weight[c_idx] / 1000)
+
+    return {
+        'c': np.concatenate((cost, np.zeros(nx + n), 2 * class_weight)),
+        'A': A,
+        'lower': lower,
+        'upper': upper,
+        'lb': np.concatenate((np.zeros(2 * nx), start_minutes, class_size)),
+        'ub': np.concatenate(((i_idx != j_idx).astype(float), class_weight[c_idx], end_minutes, class_size)),
+        'integrality': np.concatenate((np.ones(nx), np.zeros(nx + n), np.ones(C))),
+        'n': n,
+        'K': len(class_of),
+        'depot': depot,
+        'x_k': c_idx,
+        'x_i': i_idx,
+        'x_j': j_idx,
+        'class_trucks': [np.flatnonzero(class_of == c) for c in range(C)],
+    }
+
+
+def cvrptw_routes_by_type(model, solution):
+    """
+    Routes of a build_cvrptw_milp_by_type solution: each class's arcs out of the depot start one
+    route each, handed to the trucks of that class in order. Same result format as cvrptw_routes_from_solution.
+    """
+    n, depot = model['n'], model['depot']
+    nx = len(model['x_k'])
+    values = solution.x[:nx]
+    t = solution.x[2 * nx:2 * nx + n]
+    routes = {}
+    for c, trucks in enumerate(model['class_trucks']):
+        in_class = model['x_k'] == c
+        successor = successor_array(model['x_i'][in_class], model['x_j'][in_class], values[in_class], n)
+        starts = np.flatnonzero(in_class & (model['x_i'] == depot) & (values > 0.5))
+        for k, first in zip(trucks.tolist(), model['x_j'][starts].tolist()):
+            successor[depot] = first
+            routes[k] = [(i, float(t[i])) for i in walk_successors(successor, depot)]
+    return routes
+
+
+def cvrptw_routes_from_solution(model, solution):
+    """Returns {k: [(location, arrival_minutes), ...]} for every used truck, starting and ending at the depot."""
+    if 'class_trucks' in model:
+        return cvrptw_routes_by_type(model, solution)
+    n, K, depot = model['n'], model['K'], model['depot']
+    nx = len(model['x_k'])
+    values = solution.x[:nx]
+    t = solution.x[nx:nx + K * n].reshape(K, n)
+    routes = {}
+    for k in range(K):
+        on_truck = model['x_k'] == k
+        successor = successor_array(model['x_i'][on_truck], model['x_j'][on_truck], values[on_truck], n)
+        if successor[depot] == -1:
+            continue
+        routes[k] = [(i, float(t[k, i])) for i in walk_successors(successor, depot)]
+    return routes
@@ -0,0 +1,172 @@
+import json
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# CBC progress lines: new incumbents, node log (incumbent and best bound) and the final summary
+_CBC_INCUMBENT = re.compile(r'Cbc00(?:04|12)I Integer solution of (\S+) found .*\(([\d.]+) seconds\)')
+_CBC_NODES = re.compile(r'Cbc0010I After \d+ nodes, \d+ on tree, (\S+) best solution, best possible (\S+) \(([\d.]+) seconds\)')
+_CBC_DONE = re.compile(r'Cbc0001I Search completed - best objective (\S+),.*\(([\d.]+) seconds\)')
+# Gurobi node log: ... Incumbent BestBd Gap | It/Node Time
+_GUROBI_NODE = re.compile(r'(\S+)\s+(\S+)\s+(?:[\d.]+%|-)\s+\S+\s+(\d+)s$')
+
+NO_SOLUTION = 1e50  # CBC prints 1e+50 as the incumbent before the first one is found
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size (MB) of this process so far, or of its finished child processes
+    (the CBC / GLPK solver binaries) with children=True. Returns None where it cannot be measured.
+    """
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        return usage.ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+    if children:
+        return None
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().peak_wset / 1024 ** 2
+
+
+def new_run(name, **info):
+    """Returns an empty run record; `info` (instance size, solver, ...) is stored with it."""
+    return {
+        'run': name,
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'info': info,
+        'phases': [],
+        'trajectory': [],
+    }
+
+
+@contextmanager
+def phase(run, name):
+    """
+    Records the wall time of the enclosed block as one phase of `run`, with the process-lifetime
+    peak RSS at its end (peak_rss_mb, solver_peak_rss_mb for the solver binaries) and how much the
+    block raised that peak (rss_growth_mb, solver_rss_growth_mb). The growth is 0 for a block that
+    stays below an earlier peak, so it is a lower bound on the memory the block itself needed.
+    With run=None it does nothing, so functions can take an optional run.
+    """
+    if run is None:
+        yield
+        return
+    rss_before, solver_rss_before = peak_rss_mb(), peak_rss_mb(children=True)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        rss_after, solver_rss_after = peak_rss_mb(), peak_rss_mb(children=True)
+        run['phases'].append({
+            'phase': name,
+            'seconds': time.perf_counter() - start,
+            'peak_rss_mb': rss_after,
+            'rss_growth_mb': _growth(rss_before, rss_after),
+            'solver_peak_rss_mb': solver_rss_after,
+            'solver_rss_growth_mb': _growth(solver_rss_before, solver_rss_after),
+        })
+
+
+def _growth(before, after):
+    return None if before is None or after is None else after - before
+
+
+def _number(text):
+    value = float(text)
+    return None if value >= NO_SOLUTION else value
+
+
+def solver_trajectory(log_text):
+    """Parses a CBC or Gurobi log into [{'seconds', 'incumbent', 'bound'}, ...] in log order."""
+    points = []
+    for line in log_text.splitlines():
+        match = _CBC_INCUMBENT.search(line)
+        if match:
+            points.append({'seconds': float(match.group(2)), 'incumbent': _number(match.group(1)), 'bound': None})
+            continue
+        match = _CBC_NODES.search(line)
+        if match:
+            points.append({'seconds': float(match.group(3)), 'incumbent': _number(match.group(1)),
+                           'bound': _number(match.group(2))})
+            continue
+        match = _CBC_DONE.search(line)
+        if match:
+            value = _number(match.group(1))
+            points.append({'seconds': float(match.group(2)), 'incumbent': value, 'bound': value})
+            continue
+        match = _GUROBI_NODE.search(line.strip())
+        if match:
+            try:
+                incumbent = None if match.group(1) == '-' else float(match.group(1))
+                bound = None if match.group(2) == '-' else float(match.group(2))
+            except ValueError:  # Header or other line with the same shape
+                continue
+            points.append({'seconds': float(match.group(3)), 'incumbent': incumbent, 'bound': bound})
+    return points
+
+
+def trajectory_summary(trajectory, gap=0.01):
+    """Time to the first feasible solution and to an incumbent within `gap` of the final best bound (or objective)."""
+    incumbents = [p for p in trajectory if p['incumbent'] is not None]
+    bounds = [p['bound'] for p in trajectory if p['bound'] is not None]
+    summary = {'first_feasible_seconds': None, 'within_gap_seconds': None, 'gap': gap,
+               'final_incumbent': None, 'final_bound': None}
+    if not incumbents:
+        return summary
+    summary['first_feasible_seconds'] = incumbents[0]['seconds']
+    summary['final_incumbent'] = min(p['incumbent'] for p in incumbents)
+    if bounds:
+        summary['final_bound'] = max(bounds)
+    reference = summary['final_bound'] if bounds else summary['final_incumbent']
+    for p in incumbents:
+        if p['incumbent'] - reference <= gap * abs(p['incumbent']):
+            summary['within_gap_seconds'] = p['seconds']
+            break
+    return summary
+
+
+def read_solver_log(run, log_path):
+    """Adds the incumbent / bound trajectory of a CBC or Gurobi log file to the run."""
+    if run is None:
+        return
+    try:
+        with open(log_path) as log_file:
+            run['trajectory'] = solver_trajectory(log_file.read())
+    except OSError:
+        return
+    run['progress'] = trajectory_summary(run['trajectory'])
+
+
+def ortools_trajectory(routing, trajectory, scale=1000):
+    """
+    Registers an OR-Tools solution callback that appends every new solution's cost (divided by
+    `scale`, the factor the distance callbacks multiply by) to `trajectory`.
+    """
+    start = time.perf_counter()
+
+    def on_solution():
+        trajectory.append({'seconds': time.perf_counter() - start,
+                           'incumbent': routing.CostVar().Value() / scale, 'bound': None})
+
+    routing.AddAtSolutionCallback(on_solution)
+
+
+def write_run(run, path=None):
+    """Writes the run as JSON (default telemetry_<run>_<start time>.json); returns the path."""
+    if path is None:
+        path = f"telemetry_{run['run']}_{run['started'].replace(':', '')}.json"
+    if run['trajectory'] and 'progress' not in run:
+        run['progress'] = trajectory_summary(run['trajectory'])
+    with open(path, 'w') as json_file:
+        json.dump(run, json_file, indent=1)
+    return path
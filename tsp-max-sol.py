@@ -1,8 +1,13 @@
 import pandas as pd
-from haversine import haversine
+from adaptive_candidates import adaptive_candidate_arcs
+from candidate_graph import arc_lengths_dict, incoming_arcs, neighbors
 import pulp
 from pulp import GLPK, GUROBI
-import folium
+from route_extraction import tsp_tour
+from tsp_subtour import solve_with_lazy_subtours
+from warm_start import local_search_tour, ortools_initial_tour, cold_run_log, read_tour_csv, report_solver_start, set_warm_start
+from route_map import route_map
+from telemetry import new_run, phase, read_solver_log, write_run
 
 def read_data(file_path):
     df = pd.read_csv(file_path)
@@ -10,21 +15,11 @@ def read_data(file_path):
     coordinates = list(zip(df['Latitude'], df['Longitude']))
     return places, coordinates
 
-def calculate_distance_matrix(coordinates):
-    n = len(coordinates)
-    distance_matrix = [[0.0] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                distance_matrix[i][j] = haversine(coordinates[i], coordinates[j])
-    return distance_matrix
-
-def read_tsp_solution(file_path):
-    df_solution = pd.read_csv(file_path)
-    sequence_dict = df_solution.set_index('place_name')['sequence'].to_dict()
-    return sequence_dict
-
-def build_model(places, distance_matrix, sequence_dict, max_distance=1000):
+def build_model(places, candidates, tour, subtour='mtz'):
+    # candidates: sparse arc set from adaptive_candidates.adaptive_candidate_arcs (arcs within a radius grown until feasible)
+    arc_length = arc_lengths_dict(candidates)
+    incoming = incoming_arcs(candidates)
+
     # instantiate the problem - Python PuLP model
     prob = pulp.LpProblem("TSP", pulp.LpMinimize)
 
@@ -32,80 +27,80 @@ def build_model(places, distance_matrix, sequence_dict, max_distance=1000):
     #   Defining decision variables
     # ***************************************************
     x = {}  # Binary: x_i,j:= 1 if I am visiting city j after city i; otherwise 0
-    for i in range(len(places)):
-        for j in range(len(places)):
-            if i != j and distance_matrix[i][j] <= max_distance:
-                x[(i, j)] = pulp.LpVariable("x_" + str(i) + '_' + str(j), cat='Binary')
+    for (i, j) in arc_length:
+        x[(i, j)] = pulp.LpVariable("x_" + str(i) + '_' + str(j), cat='Binary')
     s = {}  # Integer: s_i is the sequence number when we are visiting city i
     for i in range(len(places)):
         s[i] = pulp.LpVariable("s_" + str(i), cat='Integer', lowBound=0, upBound=len(places) - 1)
-        place_name = places[i]
-        if place_name in sequence_dict:
-            s[i].setInitialValue(sequence_dict[place_name])
+
+    # Complete MIP start: every x_i,j and s_i from the initial tour
+    if tour:
+        set_warm_start(x, s, tour)
 
     # ********************************************
     # Objective
     # ********************************************
     # Minimize total travel distance
     obj_val = 0
-    for i in range(len(places)):
-        for j in range(len(places)):
-            if (i != j) and ((i, j) in x):
-                obj_val += pulp.lpSum(x[(i, j)] * distance_matrix[i][j]) 
+    for (i, j), distance in arc_length.items():
+        obj_val += x[(i, j)] * distance
     prob += obj_val
 
     # Constraint 1: Each city is left exactly once
     for i in range(len(places)):
         aux_sum = 0
-        for j in range(len(places)):
-            if (i != j) and ((i, j) in x):
-                aux_sum += x[(i, j)]
+        for j in neighbors(candidates, i).tolist():
+            aux_sum += x[(i, j)]
         prob += aux_sum == 1, 'Outgoing_sum_' + str(i)
 
     # Constraint 2: Each city is entered exactly once
     for j in range(len(places)):
         aux_sum = 0
-        for i in range(len(places)):
-            if (i != j) and ((i, j) in x):
-                aux_sum += x[(i, j)]
+        for i in incoming[j]:
+            aux_sum += x[(i, j)]
         prob += aux_sum == 1, 'Incoming_sum_' + str(j)
 
-    # Sub-tour elimination constraint
-    for i in range(1, len(places)):
-        for j in range(1, len(places)):
-            if (i != j) and ((i, j) in x):
+    # Sub-tour elimination constraint (MTZ); with subtour='lazy' DFJ cuts are added while solving
+    if subtour == 'mtz':
+        for (i, j) in arc_length:
+            if i != 0 and j != 0:
                 prob += s[j] >= 1 + s[i] - (len(places)) * (1-x[(i, j)]), 'sub_tour_' + str(i) + '_' + str(j)
 
     return prob, x
 
-def solve_tsp(prob, x, places):
+def solve_tsp(prob, x, places, subtour='mtz', run=None, warm_start=True, cold_log_path=None):
     # Solve the problem
     solver = 'GUROBI'  # Solver choice; 'CBC', 'GUROBI', 'GLPK'
     print('-' * 50)
     print('Optimization solver', solver, 'called')
-    prob.writeLP("C:/Users/Acer/Downloads/tsp_1023.lp")
+    log_path = 'tsp_solver.log'
+    with phase(run, 'write_lp'):
+        prob.writeLP("C:/Users/Acer/Downloads/tsp_1023.lp")
     if solver == 'CBC':
-        prob.solve(pulp.PULP_CBC_CMD())
+        solver_cmd = pulp.PULP_CBC_CMD(warmStart=warm_start, logPath=log_path)
     elif solver == 'GUROBI':
-        prob.solve(GUROBI(warmStart=True))
+        solver_cmd = GUROBI(warmStart=warm_start, logPath=log_path)
     elif solver == 'GLPK':
-        prob.solve(GLPK())
+        solver_cmd = GLPK()
     else:
         print(solver, ' not available')
         exit()
+    with phase(run, 'solve'):
+        if subtour == 'lazy':
+            solve_with_lazy_subtours(prob, x, len(places), solver_cmd)
+        else:
+            prob.solve(solver_cmd)
     print(f'Status: {pulp.LpStatus[prob.status]}')
+    if solver != 'GLPK':
+        # Start status and time to the first incumbent go into the telemetry; a cold run keeps its log
+        # at cold_log_path, and warm runs of the same instance log the time saved against it
+        mip_start = report_solver_start(log_path, warm_start, cold_log_path)
+        read_solver_log(run, log_path)
+        if run is not None:
+            run['mip_start'] = mip_start
 
     if pulp.LpStatus[prob.status] == 'Optimal':
-        n = len(places)
-        optimal_route = [0]
-        i = 0
-        while len(optimal_route) < n:
-            for j in range(n):
-                if i != j and (i, j) in x and pulp.value(x[i, j]) == 1:
-                    optimal_route.append(j)
-                    i = j
-                    break
-        optimal_route.append(0)
+        optimal_route = tsp_tour(x, len(places))
 
         total_distance = pulp.value(prob.objective)
 
@@ -117,33 +112,45 @@ def solve_tsp(prob, x, places):
         print("No optimal solution found.")
         return None, None
 
-def plot_route(optimal_route, coordinates, places):
-    # Create a map centered around the first place
-    start_coord = coordinates[places.index(optimal_route[0])]
-    m = folium.Map(location=start_coord, zoom_start=6)
-
-    # Add markers for each place with tooltips
-    for idx in optimal_route:
-        folium.Marker(
-            location=coordinates[places.index(idx)],
-            popup=coordinates[places.index(idx)],
-            tooltip=coordinates[places.index(idx)]
-        ).add_to(m)
-
-    # Add lines to show the route
-    route_coords = [coordinates[places.index(i)] for i in optimal_route]
-    folium.PolyLine(locations=route_coords, color='blue').add_to(m)
+def plot_route(optimal_route, coordinates, places, mode='auto'):
+    # One clustered marker layer and one polyline for large tours, see route_map.route_map
+    m = route_map(optimal_route, coordinates, places, mode=mode)
 
     # Save the map
     m.save('C:/Users/Acer/Downloads/tsp_route_401.html')
 
 
-data_file_path = 'C:/Users/Acer/Downloads/tsp_input.csv'
-places, coordinates = read_data(data_file_path)
-distance_matrix = calculate_distance_matrix(coordinates)
-solution_file_path = 'C:/Users/Acer/Downloads/tsp_solution_1001.csv'
-sequence_dict = read_tsp_solution(solution_file_path)
-problem, x = build_model(places, distance_matrix, sequence_dict, max_distance=2000)
-optimal_route, total_distance = solve_tsp(problem, x, places)
-if optimal_route:
-    plot_route(optimal_route, coordinates, places)
+if __name__ == '__main__':
+    data_file_path = 'C:/Users/Acer/Downloads/tsp_input.csv'
+    run = new_run('tsp-max-sol')  # Phase timings and solver progress, written to telemetry_*.json
+    with phase(run, 'read_data'):
+        places, coordinates = read_data(data_file_path)
+    solution_file_path = 'C:/Users/Acer/Downloads/tsp_solution_1001.csv'
+    # 'ortools' (heuristic run in process), 'local_search' (strip tour + 2-opt/Or-opt), 'csv', or 'none'
+    # (cold run: its solver log is kept as the reference for the time saved by the warm starts)
+    warm_start_source = 'ortools'
+
+    def find_tour(candidates):
+        # Warm-start tour in the pruned graph; an OR-Tools tour there also proves the model feasible
+        if warm_start_source in ('ortools', 'none'):
+            return ortools_initial_tour(places, candidates=candidates, coordinates=coordinates, time_limit=10)[0]
+        if warm_start_source == 'local_search':
+            return local_search_tour(coordinates, candidates=candidates)[0]
+        return read_tour_csv(solution_file_path, places)
+
+    with phase(run, 'candidate_arcs'):
+        # Starting radius, grown until the arcs pass the degree / connectivity checks and hold a tour
+        # (KD-tree, no n x n distance matrix); the warm-start tour's arcs are always included
+        candidates, tour, run['candidates'] = adaptive_candidate_arcs(coordinates, max_distance=2000, find_tour=find_tour)
+    if warm_start_source == 'none':
+        tour = None  # Same arcs as the warm-started runs (OR-Tools still certifies them), no MIP start
+    subtour_mode = 'mtz'  # 'mtz' or 'lazy' (DFJ cuts added only for the subtours found)
+    with phase(run, 'build_model'):
+        problem, x = build_model(places, candidates, tour, subtour=subtour_mode)
+    optimal_route, total_distance = solve_tsp(problem, x, places, subtour=subtour_mode, run=run,
+                                              warm_start=tour is not None,
+                                              cold_log_path=cold_run_log(data_file_path))
+    if optimal_route:
+        with phase(run, 'plot_route'):
+            plot_route(optimal_route, coordinates, places)
+    print(f'Telemetry saved to {write_run(run)}')
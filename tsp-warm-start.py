@@ -1,8 +1,12 @@
 import pandas as pd
-from haversine import haversine
+from distance_cache import cached_distance_matrix
 import pulp
 from pulp import GLPK, GUROBI
-import folium
+from route_extraction import tsp_tour
+from tsp_subtour import solve_with_lazy_subtours
+from warm_start import local_search_tour, ortools_initial_tour, cold_run_log, read_tour_csv, report_solver_start, set_warm_start
+from route_map import route_map
+from telemetry import new_run, phase, read_solver_log, write_run
 import time
 
 def read_data(file_path):
@@ -12,23 +16,8 @@ def read_data(file_path):
     return places, coordinates
 
 
-def calculate_distance_matrix(coordinates):
-    n = len(coordinates)
-    distance_matrix = [[0.0] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                distance_matrix[i][j] = haversine(coordinates[i], coordinates[j])
-    return distance_matrix
-
-
-def read_tsp_solution(file_path):
-    df_solution = pd.read_csv(file_path)
-    sequence_dict = df_solution.set_index('place_name')['sequence'].to_dict()
-    return sequence_dict
-
 
-def build_model(places, distance_matrix, sequence_dict):
+def build_model(places, distance_matrix, tour, subtour='mtz'):
     # instantiate the problem - Python PuLP model
     prob = pulp.LpProblem("TSP", pulp.LpMinimize)
 
@@ -43,9 +32,10 @@ def build_model(places, distance_matrix, sequence_dict):
     s = {}  # Integer: s_i is the sequence number when we are visiting city i
     for i in range(len(places)):
         s[i] = pulp.LpVariable("s_" + str(i), cat='Integer', lowBound=0, upBound=len(places) - 1)
-        place_name = places[i]
-        if place_name in sequence_dict:
-            s[i].setInitialValue(sequence_dict[place_name])
+
+    # Complete MIP start: every x_i,j and s_i from the initial tour
+    if tour:
+        set_warm_start(x, s, tour)
 
     # ********************************************
     # Objective
@@ -74,43 +64,49 @@ def build_model(places, distance_matrix, sequence_dict):
                 aux_sum += x[(i, j)]
         prob += aux_sum == 1, 'Incoming_sum_' + str(j)
 
-    # Sub-tour elimination constraint
-    for i in range(1, len(places)):
-        for j in range(1, len(places)):
-            if i != j:
-                prob += s[j] >= 1 + s[i] - (len(places)) * (1-x[(i, j)]), 'sub_tour_' + str(i) + '_' + str(j)
+    # Sub-tour elimination constraint (MTZ); with subtour='lazy' DFJ cuts are added while solving
+    if subtour == 'mtz':
+        for i in range(1, len(places)):
+            for j in range(1, len(places)):
+                if i != j:
+                    prob += s[j] >= 1 + s[i] - (len(places)) * (1-x[(i, j)]), 'sub_tour_' + str(i) + '_' + str(j)
 
     return prob, x
 
 
-def solve_tsp(prob, x, places):
+def solve_tsp(prob, x, places, subtour='mtz', run=None, warm_start=True, cold_log_path=None):
     # Solve the problem
     solver = 'GUROBI'  # Solver choice; 'CBC', 'GUROBI', 'GLPK'
     print('-' * 50)
     print('Optimization solver', solver, 'called')
-    prob.writeLP("C:/Users/Acer/Downloads/tsp_102.lp")
+    log_path = 'tsp_solver.log'
+    with phase(run, 'write_lp'):
+        prob.writeLP("C:/Users/Acer/Downloads/tsp_102.lp")
     if solver == 'CBC':
-        prob.solve(pulp.PULP_CBC_CMD())
+        solver_cmd = pulp.PULP_CBC_CMD(warmStart=warm_start, logPath=log_path)
     elif solver == 'GUROBI':
-        prob.solve(GUROBI(warmStart=True))
+        solver_cmd = GUROBI(warmStart=warm_start, logPath=log_path)
     elif solver == 'GLPK':
-        prob.solve(GLPK())
+        solver_cmd = GLPK()
     else:
         print(solver, ' not available')
         exit()
+    with phase(run, 'solve'):
+        if subtour == 'lazy':
+            solve_with_lazy_subtours(prob, x, len(places), solver_cmd)
+        else:
+            prob.solve(solver_cmd)
     print(f'Status: {pulp.LpStatus[prob.status]}')
+    if solver != 'GLPK':
+        # Start status and time to the first incumbent go into the telemetry; a cold run keeps its log
+        # at cold_log_path, and warm runs of the same instance log the time saved against it
+        mip_start = report_solver_start(log_path, warm_start, cold_log_path)
+        read_solver_log(run, log_path)
+        if run is not None:
+            run['mip_start'] = mip_start
 
     if pulp.LpStatus[prob.status] == 'Optimal':
-        n = len(places)
-        optimal_route = [0]
-        i = 0
-        while len(optimal_route) < n:
-            for j in range(n):
-                if i!= j and pulp.value(x[i, j]) == 1:
-                    optimal_route.append(j)
-                    i = j
-                    break
-        optimal_route.append(0)
+        optimal_route = tsp_tour(x, len(places))
 
         total_distance = pulp.value(prob.objective)
 
@@ -123,33 +119,41 @@ def solve_tsp(prob, x, places):
         return None, None
 
 
-def plot_route(optimal_route, coordinates, places):
-    # Create a map centered around the first place
-    start_coord = coordinates[places.index(optimal_route[0])]
-    m = folium.Map(location=start_coord, zoom_start=6)
-
-    # Add markers for each place with tooltips
-    for idx in optimal_route:
-        folium.Marker(
-            location=coordinates[places.index(idx)],
-            popup=coordinates[places.index(idx)],
-            tooltip=coordinates[places.index(idx)]
-        ).add_to(m)
-
-    # Add lines to show the route
-    route_coords = [coordinates[places.index(i)] for i in optimal_route]
-    folium.PolyLine(locations=route_coords, color='blue').add_to(m)
+def plot_route(optimal_route, coordinates, places, mode='auto'):
+    # One clustered marker layer and one polyline for large tours, see route_map.route_map
+    m = route_map(optimal_route, coordinates, places, mode=mode)
 
     # Save the map
     m.save('C:/Users/Acer/Downloads/tsp_route_101.html')
 
 
-data_file_path = 'C:/Users/Acer/Downloads/tsp_input.csv'
-places, coordinates = read_data(data_file_path)
-distance_matrix = calculate_distance_matrix(coordinates)
-solution_file_path = 'C:/Users/Acer/Downloads/tsp_solution_1000.csv'
-sequence_dict = read_tsp_solution(solution_file_path)
-problem, x = build_model(places, distance_matrix, sequence_dict)
-optimal_route, total_distance = solve_tsp(problem, x, places)
-if optimal_route:
-    plot_route(optimal_route, coordinates, places)
\ No newline at end of file
+if __name__ == '__main__':
+    data_file_path = 'C:/Users/Acer/Downloads/tsp_input.csv'
+    run = new_run('tsp-warm-start')  # Phase timings and solver progress, written to telemetry_*.json
+    with phase(run, 'read_data'):
+        places, coordinates = read_data(data_file_path)
+    with phase(run, 'distance_matrix'):
+        distance_matrix = cached_distance_matrix(coordinates)
+    solution_file_path = 'C:/Users/Acer/Downloads/tsp_solution_1000.csv'
+    # 'ortools' (heuristic run in process), 'local_search' (strip tour + 2-opt/Or-opt), 'csv', or 'none'
+    # (cold run: its solver log is kept as the reference for the time saved by the warm starts)
+    warm_start_source = 'ortools'
+    with phase(run, 'warm_start'):
+        if warm_start_source == 'ortools':
+            tour, _, _ = ortools_initial_tour(places, distance_matrix=distance_matrix)
+        elif warm_start_source == 'local_search':
+            tour, _, _ = local_search_tour(coordinates, distance_matrix=distance_matrix)
+        elif warm_start_source == 'csv':
+            tour = read_tour_csv(solution_file_path, places)
+        else:
+            tour = None
+    subtour_mode = 'mtz'  # 'mtz' or 'lazy' (DFJ cuts added only for the subtours found)
+    with phase(run, 'build_model'):
+        problem, x = build_model(places, distance_matrix, tour, subtour=subtour_mode)
+    optimal_route, total_distance = solve_tsp(problem, x, places, subtour=subtour_mode, run=run,
+                                              warm_start=tour is not None,
+                                              cold_log_path=cold_run_log(data_file_path))
+    if optimal_route:
+        with phase(run, 'plot_route'):
+            plot_route(optimal_route, coordinates, places)
+    print(f'Telemetry saved to {write_run(run)}')
@@ -0,0 +1,67 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # Mean earth radius, same value the haversine package uses
+
+
+def _to_radians(coordinates):
+    coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    return np.radians(coords[:, 0]), np.radians(coords[:, 1])
+
+
+def haversine_block(lat_a, lng_a, lat_b, lng_b, dtype=np.float64):
+    """Returns the haversine distances (km) between every point of block a and every point of block b."""
+    # sin((b - a) / 2) expanded into outer products, so no trig function runs on the n x n block
+    half_a, half_b = lat_a * 0.5, lat_b * 0.5
+    sin_d_lat = np.multiply.outer(np.cos(half_a), np.sin(half_b)) - np.multiply.outer(np.sin(half_a), np.cos(half_b))
+    half_a, half_b = lng_a * 0.5, lng_b * 0.5
+    sin_d_lng = np.multiply.outer(np.cos(half_a), np.sin(half_b)) - np.multiply.outer(np.sin(half_a), np.cos(half_b))
+    d = sin_d_lat * sin_d_lat
+    d += np.multiply.outer(np.cos(lat_a), np.cos(lat_b)) * (sin_d_lng * sin_d_lng)
+    np.clip(d, 0.0, 1.0, out=d)
+    np.sqrt(d, out=d)
+    np.arcsin(d, out=d)
+    d *= 2 * EARTH_RADIUS_KM
+    return d.astype(dtype, copy=False)
+
+
+def haversine_pairs(coordinates, tails, heads, dtype=np.float64):
+    """Returns the haversine distances (km) of the arcs tails[a] -> heads[a] only."""
+    lat, lng = _to_radians(coordinates)
+    tails, heads = np.asarray(tails), np.asarray(heads)
+    d = np.sin((lat[heads] - lat[tails]) * 0.5) ** 2
+    d += np.cos(lat[tails]) * np.cos(lat[heads]) * np.sin((lng[heads] - lng[tails]) * 0.5) ** 2
+    np.clip(d, 0.0, 1.0, out=d)
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(d))).astype(dtype, copy=False)
+
+
+def iter_distance_blocks(coordinates, chunk_size=1024, dtype=np.float64):
+    """Yields (row_start, row_stop, block) slices of the distance matrix, chunk_size rows at a time."""
+    lat, lng = _to_radians(coordinates)
+    n = len(lat)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        block = haversine_block(lat[start:stop], lng[start:stop], lat, lng, dtype=dtype)
+        # The diagonal is exactly zero, as in the original nested loop
+        block[np.arange(stop - start), np.arange(start, stop)] = 0.0
+        yield start, stop, block
+
+
+def haversine_matrix(coordinates, dtype=np.float64, chunk_size=None, out=None):
+    """
+    Computes the full n x n haversine distance matrix (km) as a contiguous array.
+
+    With chunk_size=None the whole matrix is computed in one broadcast; otherwise rows are
+    computed chunk_size at a time so the temporaries never exceed chunk_size x n.
+    `out` may be any writable n x n array (e.g. a np.memmap) to fill in place.
+    """
+    n = len(coordinates)
+    if out is None:
+        out = np.empty((n, n), dtype=dtype)
+    for start, stop, block in iter_distance_blocks(coordinates, chunk_size or max(n, 1), dtype=out.dtype):
+        out[start:stop] = block
+    return out
+
+
+def calculate_distance_matrix(coordinates, dtype=np.float64, chunk_size=1024):
+    # Drop-in replacement for the nested-loop version in the TSP scripts; distance_matrix[i][j] still works
+    return haversine_matrix(coordinates, dtype=dtype, chunk_size=chunk_size)
@@ -0,0 +1,226 @@
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pulp
+from scipy.sparse import vstack
+
+from ortools_tsp import solve_tsp_ortools
+from sparse_milp import build_tsp_milp, solve_milp_model, tour_from_solution
+
+ENGINES = ('ortools', 'cbc', 'highs', 'glpk')
+HEURISTIC_WAIT = 5  # Seconds the exact engines wait at most for the first OR-Tools tour to use as cutoff
+
+
+def tour_length(distance_matrix, tour):
+    """Length of the closed tour (city indices, depot first, not repeated at the end)."""
+    tour = np.asarray(tour)
+    return float(np.asarray(distance_matrix)[tour, np.roll(tour, -1)].sum())
+
+
+def pulp_from_milp(model, cutoff=None):
+    """
+    The sparse MTZ model of sparse_milp.build_tsp_milp as a PuLP problem, with variables named as
+    in the PuLP scripts (x_i_j, s_i). With a cutoff the objective is bounded by an extra row.
+    Returns (problem, columns) with one PuLP variable per model column.
+    """
+    m, n = len(model['tails']), model['n']
+    prob = pulp.LpProblem("TSP", pulp.LpMinimize)
+    columns = [pulp.LpVariable(f"x_{i}_{j}", cat='Binary')
+               for i, j in zip(model['tails'].tolist(), model['heads'].tolist())]
+    columns += [pulp.LpVariable(f"s_{i}", lowBound=0, upBound=n - 1, cat='Integer') for i in range(n)]
+    objective = pulp.LpAffineExpression([(columns[col], cost) for col, cost in enumerate(model['c'][:m].tolist())])
+    prob += objective
+    A = model['A']
+    for row, (lower, upper) in enumerate(zip(model['lower'].tolist(), model['upper'].tolist())):
+        cols, vals = A.indices[A.indptr[row]:A.indptr[row + 1]], A.data[A.indptr[row]:A.indptr[row + 1]]
+        expr = pulp.LpAffineExpression([(columns[col], val) for col, val in zip(cols.tolist(), vals.tolist())])
+        if lower == upper:
+            prob += expr == lower, f'row_{row}'
+        elif np.isinf(lower):
+            prob += expr <= upper, f'row_{row}'
+        else:
+            prob += expr >= lower, f'row_{row}'
+    if cutoff is not None:
+        prob += objective <= cutoff, 'cutoff'
+    return prob, columns
+
+
+def _mip_start(model, columns, tour):
+    """Sets the tour as initial values: its arcs and the visiting position of each city as s."""
+    m = len(model['tails'])
+    arcs = set(zip(tour, tour[1:] + tour[:1]))
+    for col, arc in enumerate(zip(model['tails'].tolist(), model['heads'].tolist())):
+        columns[col].setInitialValue(int(arc in arcs))
+    for position, city in enumerate(tour):
+        columns[m + city].setInitialValue(position)
+
+
+def _run_ortools(distance_matrix, time_limit, results):
+    # A quick first tour (the cutoff for the exact engines), then guided local search for the rest of the budget
+    start = time.perf_counter()
+    tour, _ = solve_tsp_ortools(len(distance_matrix), distance_matrix=distance_matrix)
+    if tour is None:
+        results.put(('ortools', 'done', None, None, time.perf_counter() - start, 'no_solution'))
+        return
+    results.put(('ortools', 'incumbent', tour_length(distance_matrix, tour), tour, time.perf_counter() - start, None))
+    remaining = time_limit - (time.perf_counter() - start)
+    if remaining > 0.1:
+        improved, _ = solve_tsp_ortools(
+            len(distance_matrix), distance_matrix=distance_matrix,
+            local_search_metaheuristic='GUIDED_LOCAL_SEARCH', time_limit=remaining,
+        )
+        if improved is not None and tour_length(distance_matrix, improved) < tour_length(distance_matrix, tour):
+            tour = improved
+    # A heuristic never proves optimality
+    results.put(('ortools', 'done', tour_length(distance_matrix, tour), tour, time.perf_counter() - start, 'feasible'))
+
+
+def _run_exact(engine, distance_matrix, time_limit, cutoff, start_tour, results):
+    start = time.perf_counter()
+    model = build_tsp_milp(distance_matrix)
+    remaining = max(time_limit - (time.perf_counter() - start), 1)
+    if engine == 'highs':
+        if cutoff is not None:
+            # scipy's HiGHS takes neither a MIP start nor an objective bound: the cutoff becomes a row
+            model = dict(model, A=vstack((model['A'], model['c'][None, :])).tocsr(),
+                         lower=np.append(model['lower'], -np.inf), upper=np.append(model['upper'], cutoff))
+        solution = solve_milp_model(model, time_limit=remaining)
+        found = solution.x is not None
+        status = 'optimal' if solution.status == 0 else solution.message
+    else:
+        if engine == 'cbc':
+            # CBC takes both: the tour as MIP start and the cutoff as its own option
+            prob, columns = pulp_from_milp(model)
+            options = [f'cutoff {cutoff}'] if cutoff is not None else []
+            solver = pulp.PULP_CBC_CMD(msg=False, timeLimit=remaining, warmStart=start_tour is not None, options=options)
+        else:
+            # glpsol has neither: the cutoff becomes a row
+            prob, columns = pulp_from_milp(model, cutoff=cutoff)
+            solver = pulp.GLPK(msg=False, timeLimit=remaining)
+        if start_tour is not None:
+            _mip_start(model, columns, start_tour)
+        prob.solve(solver)
+        found = prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible)
+        status = 'optimal' if prob.sol_status == pulp.LpSolutionOptimal else pulp.LpStatus[prob.status]
+        solution = SimpleNamespace(x=np.array([var.varValue or 0 for var in columns]))
+    if not found:
+        results.put((engine, 'done', None, None, time.perf_counter() - start, status))
+        return
+    tour = tour_from_solution(model, solution)[:-1]
+    kind = 'optimal' if status == 'optimal' else 'done'
+    results.put((engine, kind, tour_length(distance_matrix, tour), tour, time.perf_counter() - start, status))
+
+
+def _engine_process(engine, target, *args):
+    # Own process group, so cancelling the engine also stops the CBC / glpsol binary it started
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    try:
+        target(*args)
+    except Exception as error:
+        args[-1].put((engine, 'error', None, None, None, repr(error)))
+
+
+def _cancel(process):
+    if not process.is_alive():
+        return
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    else:
+        # Windows: the solver binary is not in a process group; it stops at its own time limit
+        process.terminate()
+    process.join(5)
+
+
+def available_engines(engines=ENGINES):
+    """The engines that can run here: CBC and GLPK need their binaries, HiGHS and OR-Tools are Python packages."""
+    checks = {'cbc': lambda: pulp.PULP_CBC_CMD(msg=False).available(),
+              'glpk': lambda: pulp.GLPK(msg=False).available()}
+    return [engine for engine in engines if checks.get(engine, lambda: True)()]
+
+
+def race_tsp(distance_matrix, engines=ENGINES, time_limit=60, heuristic_wait=HEURISTIC_WAIT):
+    """
+    Races several engines on the MTZ TSP of distance_matrix, each in its own process: the OR-Tools
+    heuristic and the exact CBC, HiGHS and GLPK solvers (those not installed are skipped). The
+    first OR-Tools tour (waited for at most heuristic_wait seconds) is handed to the exact engines
+    as cutoff, and to CBC also as MIP start.
+
+    Returns as soon as an exact engine proves optimality or time_limit seconds have passed,
+    cancelling the engines still running. Returns (tour, length_km, report): the best tour found
+    by any engine (city indices from 0, not closed), and per engine its status, tour length and
+    seconds, the engine whose tour won and the engine that proved it optimal (None on timeout).
+    """
+    distance_matrix = np.asarray(distance_matrix, dtype=np.float64)
+    start = time.perf_counter()
+    deadline = start + time_limit
+    usable = available_engines(engines)
+    report = {'engines': {engine: {'status': 'unavailable'} for engine in engines if engine not in usable},
+              'cutoff': None, 'winner': None, 'proved_by': None}
+    results = multiprocessing.get_context().Queue()
+    processes, best = {}, [None, None, None]  # length, tour, engine
+
+    def launch(engine, target, *args):
+        process = multiprocessing.get_context().Process(
+            target=_engine_process, args=(engine, target, *args, results), daemon=True
+        )
+        process.start()
+        processes[engine] = process
+        report['engines'][engine] = {'status': 'running'}
+
+    def handle(message):
+        engine, kind, length, tour, seconds, status = message
+        if length is not None and (best[0] is None or length < best[0] - 1e-9):
+            best[:] = [length, tour, engine]
+        if kind != 'incumbent':
+            report['engines'][engine] = {'status': status, 'length': length,
+                                         'seconds': round(seconds, 3) if seconds is not None else None}
+        if kind == 'optimal':
+            report['proved_by'] = engine
+        return kind
+
+    def receive(timeout):
+        try:
+            return handle(results.get(timeout=max(timeout, 0)))
+        except queue.Empty:
+            return None
+
+    try:
+        if 'ortools' in usable:
+            launch('ortools', _run_ortools, distance_matrix, time_limit)
+            wait_until = min(start + heuristic_wait, deadline)
+            while best[0] is None and time.perf_counter() < wait_until and processes['ortools'].is_alive():
+                receive(wait_until - time.perf_counter())
+        if best[0] is not None:
+            report['cutoff'] = best[0] + max(1e-6, 1e-9 * best[0])  # The start tour itself must stay feasible
+        for engine in usable:
+            if engine != 'ortools':
+                launch(engine, _run_exact, engine, distance_matrix, deadline - time.perf_counter(),
+                       report['cutoff'], best[1])
+
+        while time.perf_counter() < deadline:
+            running = [engine for engine, status in report['engines'].items() if status['status'] == 'running']
+            if not running:
+                break
+            if receive(min(deadline - time.perf_counter(), 0.5)) == 'optimal':
+                break
+        # Messages sent just before the deadline
+        while receive(0) is not None:
+            pass
+    finally:
+        for engine, process in processes.items():
+            if process.is_alive():
+                _cancel(process)
+                if report['engines'][engine]['status'] == 'running':
+                    report['engines'][engine] = {'status': 'cancelled'}
+    report['winner'] = best[2]
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return best[1], best[0], report
@@ -0,0 +1,68 @@
+import numpy as np
+import pulp
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from route_extraction import variable_values
+
+
+def find_subtours(x, n, tol=1e-6):
+    """
+    Returns the connected components (as lists of cities) of the arcs with x_i,j > tol.
+
+    For an integer solution these are exactly the subtours; for an LP solution a component that
+    does not contain every city still gives a violated subtour elimination cut.
+    """
+    keys, values = variable_values(x)
+    arcs = [keys[a] for a in np.flatnonzero(values > tol).tolist()]
+    if not arcs:
+        return [[i] for i in range(n)]
+    tails, heads = np.array(arcs).T
+    graph = coo_matrix((np.ones(len(arcs)), (tails, heads)), shape=(n, n))
+    n_components, labels = connected_components(graph, directed=True, connection='weak')
+    order = np.argsort(labels, kind='stable')
+    bounds = np.searchsorted(labels[order], np.arange(n_components + 1))
+    return [order[bounds[c]:bounds[c + 1]].tolist() for c in range(n_components)]
+
+
+def add_subtour_cuts(prob, x, subtours, round_no):
+    """Adds one DFJ cut sum(x_i,j for i, j in S) <= |S| - 1 per subtour S; returns the number of cuts."""
+    component = {}
+    for c, subtour in enumerate(subtours):
+        for i in subtour:
+            component[i] = c
+    inside = [[] for _ in subtours]
+    for (i, j), var in x.items():
+        if component[i] == component[j]:
+            inside[component[i]].append(var)
+    cuts = 0
+    for c, subtour in enumerate(subtours):
+        if inside[c]:
+            prob += pulp.lpSum(inside[c]) <= len(subtour) - 1, 'subtour_cut_' + str(round_no) + '_' + str(c)
+            cuts += 1
+    return cuts
+
+
+def solve_with_lazy_subtours(prob, x, n, solver, max_rounds=1000):
+    """
+    Solves a TSP built with only the degree constraints, adding DFJ subtour elimination cuts
+    for the subtours of each solution and re-solving until the tour is a single cycle.
+
+    Works with any PuLP solver command (CBC, GLPK, GUROBI); returns the number of rounds and cuts.
+    """
+    rounds, total_cuts = 0, 0
+    while True:
+        rounds += 1
+        prob.solve(solver)
+        if pulp.LpStatus[prob.status] != 'Optimal':
+            break
+        subtours = find_subtours(x, n, tol=0.5)
+        if len(subtours) == 1:
+            break
+        if rounds == max_rounds:
+            # Still not a single cycle: don't report the subtour solution as an optimal tour
+            prob.status = pulp.LpStatusNotSolved
+            break
+        total_cuts += add_subtour_cuts(prob, x, subtours, rounds)
+    print(f'Lazy subtour elimination: {rounds} rounds, {total_cuts} cuts added')
+    return {'rounds': rounds, 'cuts': total_cuts}
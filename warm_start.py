@@ -0,0 +1,186 @@
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from candidate_graph import CandidateArcs, arc_tails, union_arcs
+from local_search import improve_tour, strip_tour
+from ortools_tsp import solve_tsp_ortools
+
+
+def read_tour_csv(file_path, places):
+    """
+    Reads a tour saved by OR TOOLS INITIAL SOLVE.py (`sequence,place_name`, one row per stop in
+    visiting order, depot repeated at the end) and returns it as city indices in visiting order.
+    """
+    df_solution = pd.read_csv(file_path)
+    index = {place: i for i, place in enumerate(places)}
+    tour = [index[place] for place in df_solution['place_name'] if place in index]
+    return list(dict.fromkeys(tour))  # Drops the closing depot row
+
+
+def ortools_initial_tour(places, distance_matrix=None, candidates=None, coordinates=None, time_limit=None):
+    """Runs the OR-Tools heuristic in process and returns (tour, objective_km, seconds)."""
+    start = time.perf_counter()
+    tour, objective = solve_tsp_ortools(
+        len(places), distance_matrix=distance_matrix, candidates=candidates,
+        coordinates=coordinates, time_limit=time_limit,
+    )
+    elapsed = time.perf_counter() - start
+    if tour is not None:
+        print(f'OR-Tools initial tour: {objective:.3f} km in {elapsed:.2f} s')
+    return tour, objective, elapsed
+
+
+def local_search_tour(coordinates, distance_matrix=None, candidates=None, tour=None, time_limit=None):
+    """
+    Improves `tour` (default: a strip tour) with 2-opt / Or-opt over the candidate neighbors and
+    returns (tour, length_km, seconds). Needs no distance matrix, so it also serves 10k+ cities.
+    """
+    start = time.perf_counter()
+    if tour is None:
+        tour = strip_tour(coordinates)
+    tour, length, stats = improve_tour(
+        tour, distance_matrix=distance_matrix, coordinates=coordinates, candidates=candidates, time_limit=time_limit,
+    )
+    elapsed = time.perf_counter() - start
+    print(f'Local search tour: {length:.3f} km in {elapsed:.2f} s '
+          f'({stats["two_opt"]} 2-opt, {stats["or_opt"]} Or-opt moves)')
+    return depot_first(tour), length, elapsed
+
+
+def depot_first(tour, depot=0):
+    """The same closed tour rotated to start at the depot, as the MTZ sequence numbers require."""
+    tour = list(tour)
+    k = tour.index(depot)
+    return tour[k:] + tour[:k]
+
+
+def tour_arcs(tour):
+    return list(zip(tour, tour[1:] + tour[:1]))
+
+
+def include_tour_arcs(coordinates, candidates, tour):
+    """
+    Repairs a pruned arc set so that the warm-start tour is feasible in it: adds every tour arc
+    missing from the candidates. Returns (candidates, number of arcs added).
+    """
+    n = len(candidates.indptr) - 1
+    present = set((arc_tails(candidates) * n + candidates.heads).tolist())
+    missing = [(i, j) for i, j in tour_arcs(tour) if i * n + j not in present]
+    if not missing:
+        return candidates, 0
+    tails, heads = (np.array(v, dtype=np.int64) for v in zip(*missing))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tails, minlength=n), out=indptr[1:])
+    extra = CandidateArcs(indptr, heads, np.zeros(len(heads)))
+    print(f'Warm start: {len(missing)} tour arcs were outside the pruned arc set and have been added')
+    return union_arcs(coordinates, candidates, extra), len(missing)
+
+
+def set_warm_start(x, s, tour):
+    """
+    Sets a complete MIP start from the tour: every x_i,j (1 on tour arcs, 0 elsewhere) and the
+    MTZ sequence numbers s_i (position of city i in the tour rotated to start at the depot, city 0).
+    Returns the tour arcs that have no x variable; the start is only complete if this is empty.
+    """
+    tour = depot_first(tour)
+    arcs = set(tour_arcs(tour))
+    for arc, var in x.items():
+        var.setInitialValue(1 if arc in arcs else 0)
+    for position, i in enumerate(tour):
+        if i in s:
+            s[i].setInitialValue(position)
+    missing = [arc for arc in arcs if arc not in x]
+    if missing:
+        print(f'Warm start incomplete: {len(missing)} tour arcs have no x variable')
+    violated = mtz_violations(x, s, len(tour))
+    if violated:
+        print(f'Warm start infeasible: {len(violated)} MTZ rows violated, e.g. {violated[:3]}')
+    return missing
+
+
+def mtz_violations(x, s, n):
+    """
+    Checks the start values set on x and s against the MTZ rows of the scripts,
+    s_j >= s_i + 1 - n * (1 - x_i,j) for i, j != 0, and the bounds 0 <= s_i <= n - 1.
+    Returns the violated arcs (or ('bound', i) for an s_i out of bounds).
+    """
+    violated = [('bound', i) for i, var in s.items() if var.varValue is None or not 0 <= var.varValue <= n - 1]
+    for (i, j), var in x.items():
+        if i == 0 or j == 0 or i not in s or j not in s or s[i].varValue is None or s[j].varValue is None:
+            continue
+        if s[j].varValue < 1 + s[i].varValue - n * (1 - (var.varValue or 0)):
+            violated.append((i, j))
+    return violated
+
+
+# Solver log lines telling whether the MIP start was used, and the time of the first incumbent
+_START_ACCEPTED = re.compile(r'Loaded user MIP start with objective|MIPStart provided solution with cost')
+_START_REJECTED = re.compile(r'User MIP start did not produce|MIPstart solution is not valid|'
+                             r'User MIP start violates|mipstart values could not be used')
+_CBC_INCUMBENT = re.compile(r'Cbc00(?:04|12|16)I Integer solution of .* \(([\d.]+) seconds\)')
+_GUROBI_INCUMBENT = re.compile(r'^[H*]\s*\d+\s+\d+.*?(\d+)s$')
+
+
+def first_incumbent_seconds(log_text):
+    """Returns the time (s) of the first incumbent found in a CBC or Gurobi log, or None."""
+    if _START_ACCEPTED.search(log_text):
+        return 0.0
+    for line in log_text.splitlines():
+        match = _CBC_INCUMBENT.search(line) or _GUROBI_INCUMBENT.search(line.strip())
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def cold_run_log(data_file_path):
+    """Where the solver log of an instance solved without warm start is kept: next to its data file."""
+    return f'{os.path.splitext(data_file_path)[0]}_cold_solver.log'
+
+
+def report_solver_start(log_path, warm_start, cold_log_path):
+    """
+    Reports a finished solve for the run telemetry. A warm-started run goes through report_mip_start
+    against the cold-run log (if one was recorded). A run without warm start is the reference: its log
+    is copied to cold_log_path and its time to the first incumbent returned.
+    """
+    if warm_start:
+        if not os.path.exists(cold_log_path):
+            print(f'No cold-run log at {cold_log_path}; solve once without warm start to log the time saved')
+            cold_log_path = None
+        return report_mip_start(log_path, cold_log_path)
+    shutil.copyfile(log_path, cold_log_path)
+    with open(log_path) as log_file:
+        first = first_incumbent_seconds(log_file.read())
+    print(f'Cold start: first incumbent after {first} s; log kept at {cold_log_path}')
+    return {'mip_start': 'none', 'first_incumbent_seconds': first}
+
+
+def report_mip_start(log_path, cold_log_path=None):
+    """
+    Logs whether the solver accepted the MIP start and the time to the first incumbent; with the
+    log of a run without warm start (cold_log_path) it also logs the time saved.
+    """
+    with open(log_path) as log_file:
+        log_text = log_file.read()
+    if _START_ACCEPTED.search(log_text):
+        status = 'accepted'
+    elif _START_REJECTED.search(log_text):
+        status = 'rejected'
+    else:
+        status = 'not reported'
+    first = first_incumbent_seconds(log_text)
+    report = {'mip_start': status, 'first_incumbent_seconds': first}
+    message = f'MIP start {status}; first incumbent after {first} s'
+    if cold_log_path is not None:
+        with open(cold_log_path) as log_file:
+            cold_first = first_incumbent_seconds(log_file.read())
+        if first is not None and cold_first is not None:
+            report['time_saved_seconds'] = cold_first - first
+            message += f' (cold start: {cold_first} s, saved {cold_first - first:.2f} s)'
+    print(message)
+    return report